@@ -0,0 +1,272 @@
+"""
+Headless JSON HTTP API for kiosks and backend integrations.
+
+    python api.py --port 8080 --workers 4
+
+    GET  /product/<gtin>[?fuzzy=1]   analysis for a barcode number
+    POST /scan[?fuzzy=1]             raw image bytes in the body; decode, then analyze
+    GET  /healthz                    liveness plus the table version
+    GET  /metrics[?format=json]      stage latencies (Prometheus text by default) and cache stats
+
+Responses are HTTP/1.1 with Content-Length, so clients can keep connections
+alive. Lookups go through source.reconcile (offline index, product cache,
+coalesced OpenFoodFacts calls). Encoded responses are cached per (GTIN,
+table versions, fuzzy), so repeat requests skip the analysis entirely.
+zbar runs in a bounded process pool; when every slot is busy /scan answers
+503 instead of queueing without limit.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import source
+import tracing
+from engine import analyze_product
+from gtin import InvalidGTIN
+from render import RenderCache
+from source import UpstreamError, decode_barcode, reconcile
+from tables import get_table_store
+from tracing import span
+
+log = logging.getLogger(__name__)
+
+API_MAX_UPLOAD_BYTES = int(os.environ.get("BITERIGHT_API_MAX_UPLOAD", 15 * 1024 * 1024))
+_PRODUCT_PATH = re.compile(r"^/product/([^/]+)/?$")
+
+
+class APIError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _decode(data: bytes):
+    # runs in a worker process; Barcode is a NamedTuple, so it pickles back cheaply
+    return decode_barcode(data)
+
+
+class BiteRightAPI:
+    """Request-independent state shared by all handler threads."""
+
+    def __init__(self, workers: int = None, queue_per_worker: int = 4, cache_size: int = 10000,
+                 cache_ttl: float = 3600):
+        self.workers = workers or os.cpu_count() or 1
+        # workers start lazily from handler threads; forking there would copy whatever locks
+        # other threads hold (tracing's registry, logging), so fork from a clean server instead
+        self.pool = ProcessPoolExecutor(max_workers=self.workers,
+                                        mp_context=multiprocessing.get_context("forkserver"))
+        # at most this many decodes running or queued; beyond that /scan sheds load
+        self._decode_slots = threading.BoundedSemaphore(self.workers * queue_per_worker)
+        self.responses = RenderCache(max_entries=cache_size, ttl=cache_ttl)
+        self.tables = get_table_store()
+
+    def product(self, gtin: str, fuzzy: bool = False) -> bytes:
+        tables = self.tables.current()
+        key = (gtin, tables.risk_version, tables.dv_version, fuzzy)
+        body = self.responses.get(key)
+        if body is not None:
+            return body
+        try:
+            data = reconcile(gtin)
+        except InvalidGTIN as e:
+            raise APIError(HTTPStatus.BAD_REQUEST, str(e))
+        except UpstreamError as e:
+            raise APIError(HTTPStatus.BAD_GATEWAY, f"OpenFoodFacts unavailable: {e}")
+        if data is None:
+            raise APIError(HTTPStatus.NOT_FOUND, f"no OpenFoodFacts product for {gtin}")
+        analysis = analyze_product(data, tables, fuzzy=fuzzy)
+        body = json.dumps({"gtin": gtin, "tables_version": tables.version,
+                           "analysis": analysis.to_dict()}).encode()
+        self.responses.put(key, body)
+        return body
+
+    def decode(self, image: bytes, timeout: float = 30):
+        cache = source.get_decode_cache()
+        if cache:
+            # repeat uploads are answered here without touching the pool
+            return cache.get_or_decode(image, lambda data: self._decode_in_pool(data, timeout))
+        return self._decode_in_pool(image, timeout)
+
+    def _decode_in_pool(self, image: bytes, timeout: float):
+        if not self._decode_slots.acquire(blocking=False):
+            raise APIError(HTTPStatus.SERVICE_UNAVAILABLE, "decoder busy, retry shortly")
+        try:
+            return self.pool.submit(_decode, image).result(timeout=timeout)
+        except FutureTimeout:
+            raise APIError(HTTPStatus.GATEWAY_TIMEOUT, f"decoding took longer than {timeout:g}s")
+        except (OSError, ValueError) as e:
+            # PIL's UnidentifiedImageError is an OSError
+            raise APIError(HTTPStatus.BAD_REQUEST, f"not a readable image: {e}")
+        finally:
+            self._decode_slots.release()
+
+    def stats(self) -> dict:
+        cache = source.get_product_cache()
+        decode_cache = source.get_decode_cache()
+        return {
+            "responses": self.responses.stats(),
+            "product_cache": cache.stats() if cache else {"enabled": False},
+            "decode_cache": decode_cache.stats() if decode_cache else {"enabled": False},
+            "upstream_flights": source.upstream_flights.stats(),
+            "tables": self.tables.stats(),
+            "stages": tracing.snapshot(),
+        }
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    server_version = "BiteRight/1.0"
+    disable_nagle_algorithm = True
+
+    @property
+    def api(self) -> BiteRightAPI:
+        return self.server.api
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        try:
+            match = _PRODUCT_PATH.match(url.path)
+            if match:
+                with span("api.product"):
+                    body = self.api.product(match.group(1), _flag(query, "fuzzy"))
+                self._send(HTTPStatus.OK, body)
+            elif url.path == "/healthz":
+                self._json(HTTPStatus.OK, {"status": "ok", "tables_version": self.api.tables.version})
+            elif url.path == "/metrics":
+                if query.get("format", [""])[0] == "json":
+                    self._json(HTTPStatus.OK, self.api.stats())
+                else:
+                    self._send(HTTPStatus.OK, tracing.export_prometheus().encode(),
+                               "text/plain; version=0.0.4")
+            else:
+                raise APIError(HTTPStatus.NOT_FOUND, f"no route for GET {url.path}")
+        except APIError as e:
+            self._json(e.status, {"error": str(e)})
+        except Exception:
+            self._internal_error()
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        try:
+            if url.path.rstrip("/") != "/scan":
+                self._discard_body()
+                raise APIError(HTTPStatus.NOT_FOUND, f"no route for POST {url.path}")
+            image = self._read_body()
+            with span("api.scan"):
+                found = self.api.decode(image)
+                if found is None:
+                    raise APIError(HTTPStatus.UNPROCESSABLE_ENTITY, "no EAN/UPC barcode found in the image")
+                body = self.api.product(found.data, _flag(parse_qs(url.query), "fuzzy"))
+            self._send(HTTPStatus.OK, body)
+        except APIError as e:
+            self._json(e.status, {"error": str(e)})
+        except Exception:
+            self._internal_error()
+
+    # ---------- plumbing ----------
+
+    def _internal_error(self):
+        # a bug in one request must not drop the client's connection without an answer
+        log.exception("%s %s failed", self.command, self.path)
+        self.close_connection = True
+        self._json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "internal server error"})
+
+    def _read_body(self) -> bytes:
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length <= 0:
+            self.close_connection = True
+            raise APIError(HTTPStatus.LENGTH_REQUIRED, "send the image as the request body with a Content-Length")
+        if length > API_MAX_UPLOAD_BYTES:
+            # the unread body would corrupt the next request on this connection
+            self.close_connection = True
+            raise APIError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"image larger than {API_MAX_UPLOAD_BYTES} bytes")
+        return self.rfile.read(length)
+
+    def _discard_body(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if 0 < length <= API_MAX_UPLOAD_BYTES:
+            self.rfile.read(length)
+        elif length:
+            self.close_connection = True
+
+    def _send(self, status, body: bytes, content_type: str = "application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, status, obj):
+        self._send(status, json.dumps(obj).encode())
+
+    def log_message(self, format, *args):
+        log.debug("%s - %s", self.address_string(), format % args)
+
+
+def _flag(query, name) -> bool:
+    return query.get(name, ["0"])[0].lower() in ("1", "true", "yes")
+
+
+class APIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, api: BiteRightAPI):
+        self.api = api
+        super().__init__(address, Handler)
+
+    def server_close(self):
+        super().server_close()
+        self.api.close()
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8080, workers: int = None) -> APIServer:
+    return APIServer((host, port), BiteRightAPI(workers=workers))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Serve BiteRight analyses as JSON over HTTP.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="zbar decoder processes (default: CPU count)")
+    ap.add_argument("--base-url", default=source.OFF_BASE_URL, help="OpenFoodFacts base URL")
+    ap.add_argument("-v", "--verbose", action="store_true", help="log every request")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if args.base_url != source.OFF_BASE_URL:
+        source.set_client(source.OpenFoodFactsClient(base_url=args.base_url))
+    server = make_server(args.host, args.port, args.workers)
+    server.api.tables.start()
+    log.info("listening on http://%s:%d (%d decoder processes)", args.host, args.port, server.api.workers)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
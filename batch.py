@@ -0,0 +1,135 @@
+"""
+Decode barcodes from a folder (or glob) of product photos in parallel.
+
+    python batch.py shelf_photos/ --workers 8 -o results.jsonl
+    python batch.py "audits/2025-*/**/*.jpg"
+
+Writes one JSON line per image: {"path", "gtin", "symbology", "ms", "error"}.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from source import decode_barcode
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tif", ".tiff"}
+
+
+def collect_images(inputs):
+    """Expand directories (recursively) and glob patterns into a sorted list of image paths."""
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                for name in files:
+                    paths.add(os.path.join(root, name))
+        else:
+            paths.update(glob.glob(item, recursive=True) or [item])
+    return sorted(p for p in paths if os.path.splitext(p)[1].lower() in IMAGE_EXTENSIONS)
+
+
+def _record(path, error=None) -> dict:
+    return {"path": path, "gtin": None, "symbology": None, "ms": None, "error": error}
+
+
+def decode_file(path: str) -> dict:
+    t0 = time.perf_counter()
+    record = _record(path)
+    try:
+        with open(path, "rb") as f:
+            found = decode_barcode(f.read())
+        if found:
+            record["gtin"], record["symbology"] = found.data, found.symbology
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    return record
+
+
+def _decode_in_pool(paths, workers, write):
+    """
+    Decode paths in one pool, keeping at most `workers` images in flight.
+    Returns ([], []) when all were written, or (in flight, not yet submitted)
+    if a worker died and broke the pool.
+    """
+    todo = iter(paths)
+    running = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        def submit_next():
+            path = next(todo, None)
+            if path is not None:
+                running[pool.submit(decode_file, path)] = path
+
+        for _ in range(workers):
+            submit_next()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                try:
+                    record = fut.result()
+                except BrokenProcessPool:
+                    return list(running.values()), list(todo)
+                del running[fut]
+                write(record)
+                submit_next()
+    return [], []
+
+
+def run(paths, workers=None, out=sys.stdout):
+    """Decode paths across a process pool, writing records to out as they finish."""
+    workers = workers or os.cpu_count() or 1
+    stats = {"images": 0, "decoded": 0, "failed": 0, "errors": 0}
+
+    def write(record):
+        stats["images"] += 1
+        if record["error"]:
+            stats["errors"] += 1
+        elif record["gtin"]:
+            stats["decoded"] += 1
+        else:
+            stats["failed"] += 1
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+
+    todo = list(paths)
+    while todo:
+        suspects, todo = _decode_in_pool(todo, workers, write)
+        # a worker crashed (e.g. inside libzbar) and took the pool down: retry each image
+        # that was in flight on its own, so only the one that kills its worker is written off
+        for path in suspects:
+            if _decode_in_pool([path], 1, write)[0]:
+                write(_record(path, "BrokenProcessPool: decoder process died"))
+    return stats
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("inputs", nargs="+", help="image files, directories or glob patterns")
+    ap.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                    help="decoder processes (default: CPU count)")
+    ap.add_argument("-o", "--output", help="JSONL output file (default: stdout)")
+    args = ap.parse_args(argv)
+
+    paths = collect_images(args.inputs)
+    if not paths:
+        ap.error("no images found")
+
+    t0 = time.perf_counter()
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        stats = run(paths, workers=args.workers, out=out)
+    finally:
+        if args.output:
+            out.close()
+    elapsed = time.perf_counter() - t0
+    print(f"{stats['images']} images in {elapsed:.1f}s: {stats['decoded']} decoded, "
+          f"{stats['failed']} no barcode, {stats['errors']} errors", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
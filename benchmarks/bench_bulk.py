@@ -0,0 +1,59 @@
+"""
+Sequential reconcile() vs bulk.bulk_lookup() against the local OFF stub.
+
+    python benchmarks/bench_bulk.py --gtins 200 --latency 0.05 --concurrency 32
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import source  # noqa: E402
+from bulk import bulk_lookup  # noqa: E402
+from source import OpenFoodFactsClient, RateLimiter  # noqa: E402
+from stub_off import StubOFF, make_gtin  # noqa: E402
+
+
+async def drain(gtins, concurrency):
+    return [r async for r in bulk_lookup(gtins, concurrency=concurrency)]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--gtins", type=int, default=200)
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--rate", type=float, default=0, help="rate cap for the bulk run (0 = none)")
+    args = ap.parse_args(argv)
+
+    # measure the network path only
+    source.set_product_cache(None)
+    gtins = [make_gtin(i) for i in range(args.gtins)]
+
+    with StubOFF(latency=args.latency) as stub:
+        source.set_client(OpenFoodFactsClient(base_url=stub.url, pool_size=1))
+        t0 = time.perf_counter()
+        for g in gtins:
+            source.reconcile(g)
+        sequential = time.perf_counter() - t0
+
+        limiter = RateLimiter(args.rate, burst=args.concurrency) if args.rate > 0 else None
+        source.set_client(OpenFoodFactsClient(base_url=stub.url, pool_size=args.concurrency,
+                                              rate_limiter=limiter))
+        t0 = time.perf_counter()
+        records = asyncio.run(drain(gtins, args.concurrency))
+        bulk = time.perf_counter() - t0
+
+    errors = sum(1 for r in records if r["error"])
+    print(f"{args.gtins} GTINs, {args.latency * 1000:.0f} ms stub latency")
+    print(f"  sequential : {sequential:6.2f}s  {args.gtins / sequential:8.1f} GTIN/s")
+    print(f"  bulk (c={args.concurrency:<3}): {bulk:6.2f}s  {args.gtins / bulk:8.1f} GTIN/s  "
+          f"{sequential / bulk:.1f}x, {errors} errors")
+
+
+if __name__ == "__main__":
+    main()
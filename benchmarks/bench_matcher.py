@@ -0,0 +1,109 @@
+"""
+Compare RiskMatcher against the old per-token sorted scan from main().
+
+    python benchmarks/bench_matcher.py --aliases 20 500 5000 --tokens 200
+"""
+import argparse
+import ast
+import csv
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from matcher import RiskMatcher, UNKNOWN  # noqa: E402
+
+RISK_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        "harmful_ingredients_risk_list.csv")
+
+
+def legacy_match(alias_map, token_norm):
+    if token_norm in alias_map:
+        return alias_map[token_norm]
+    for alias in sorted(alias_map.keys(), key=len, reverse=True):
+        if alias in token_norm:
+            return alias_map[alias]
+    return UNKNOWN
+
+
+def real_aliases():
+    alias_map = {}
+    with open(RISK_CSV, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            for label in ast.literal_eval(row["Labels"]):
+                alias_map[label.strip().lower()] = (row["Category"], row["Risk Level"], row["Main Concern"])
+    return alias_map
+
+
+def synthetic_aliases(n, rng):
+    alias_map = real_aliases()
+    while len(alias_map) < n:
+        if rng.random() < 0.5:
+            alias = f"e{rng.randint(100, 1599)}{rng.choice(['', 'a', 'i', 'ii'])}"
+        else:
+            alias = " ".join("".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9)))
+                             for _ in range(rng.randint(1, 3)))
+        alias_map.setdefault(alias, ("Synthetic", rng.choice(["High", "Moderate", "Low"]), "bench"))
+    return alias_map
+
+
+def synthetic_tokens(alias_map, n, rng):
+    aliases = list(alias_map)
+    tokens = []
+    for _ in range(n):
+        filler = " ".join("".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 8)))
+                          for _ in range(rng.randint(1, 4)))
+        r = rng.random()
+        if r < 0.3:
+            tokens.append(rng.choice(aliases))
+        elif r < 0.6:
+            tokens.append(f"{filler} {rng.choice(aliases)}")
+        else:
+            tokens.append(filler)
+    return tokens
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--aliases", type=int, nargs="+", default=[20, 500, 5000])
+    ap.add_argument("--tokens", type=int, default=200)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    print(f"{'aliases':>8} {'tokens':>7} {'build ms':>9} {'legacy ms':>10} {'matcher ms':>11} {'speedup':>8}")
+    for n in args.aliases:
+        alias_map = synthetic_aliases(n, rng)
+        tokens = synthetic_tokens(alias_map, args.tokens, rng)
+
+        t0 = time.perf_counter()
+        matcher = RiskMatcher(alias_map)
+        build = time.perf_counter() - t0
+
+        expected = [legacy_match(alias_map, t) for t in tokens]
+        got = [matcher.match(t) for t in tokens]
+        if got != expected:
+            bad = next(t for t, a, b in zip(tokens, got, expected) if a != b)
+            raise SystemExit(f"mismatch on token {bad!r}")
+
+        legacy = timed(lambda: [legacy_match(alias_map, t) for t in tokens], args.repeat)
+        fast = timed(lambda: [matcher.match(t) for t in tokens], args.repeat)
+        print(f"{len(alias_map):>8} {len(tokens):>7} {build * 1e3:>9.2f} {legacy * 1e3:>10.2f} "
+              f"{fast * 1e3:>11.2f} {legacy / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Load test: concurrent scan sessions against the local OpenFoodFacts stub.
+
+    python benchmarks/loadtest.py --rate 200 --duration 30 --concurrency 64
+    python benchmarks/loadtest.py --rate 100 --latency 0.08 --error-rate 0.02 --scan-ratio 0.2
+    python benchmarks/loadtest.py --target api --rate 500 -o load.json
+
+Arrivals are open-loop (Poisson at --rate per second) so a slow node builds
+a queue instead of quietly lowering the offered load; latency is measured
+from each request's scheduled arrival, queueing included. With --rate 0
+every one of --concurrency sessions issues requests back to back instead.
+
+GTIN popularity is Zipfian over a --catalog of products (a few best sellers
+get most scans); half of the catalog are UPC-As with a leading 0, which
+reconcile() must resolve with a single upstream request. --miss-ratio of
+requests use GTINs the stub does not know, and --scan-ratio of them decode
+barcode3.jpg first to put zbar on the CPU.
+
+Targets:
+  inproc  reconcile() + analyze_product(), the Streamlit request path
+  api     the same through api.py over HTTP keep-alive (one connection per worker)
+"""
+import argparse
+import bisect
+import http.client
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+import source  # noqa: E402
+from cache import ProductCache  # noqa: E402
+from engine import analyze_product  # noqa: E402
+from gtin import check_digit  # noqa: E402
+from source import OpenFoodFactsClient, UpstreamError  # noqa: E402
+from stub_off import StubOFF, make_gtin  # noqa: E402
+
+SEED_IMAGE = os.path.join(ROOT, "barcode3.jpg")
+PERCENTILES = (50, 95, 99)
+
+
+class Zipf:
+    """Sample ranks 0..n-1 with P(k) proportional to 1 / (k + 1) ** s."""
+
+    def __init__(self, n: int, s: float, rng: random.Random):
+        self.rng = rng
+        self.cdf = list(itertools.accumulate(1.0 / (k + 1) ** s for k in range(n)))
+
+    def sample(self) -> int:
+        return bisect.bisect_left(self.cdf, self.rng.random() * self.cdf[-1])
+
+
+def unknown_gtin(i: int) -> str:
+    """A valid GTIN-13 the stub answers 404 for (prefix 3)."""
+    body = f"3{i:011d}"
+    return body + str(check_digit(body))
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))]
+
+
+# ---------- targets ----------
+
+class InProcTarget:
+    def __init__(self, image):
+        self.image = image
+
+    def __call__(self, gtin, scan):
+        if scan:
+            source.decode_barcode(self.image)
+        data = source.reconcile(gtin)
+        if data is None:
+            return "not_found"
+        analyze_product(data)
+        return "ok"
+
+
+class APITarget:
+    """One keep-alive connection per worker thread."""
+
+    def __init__(self, port, image):
+        self.port = port
+        self.image = image
+        self._local = threading.local()
+
+    def _request(self, method, path, body=None):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+        try:
+            conn.request(method, path, body=body)
+            r = conn.getresponse()
+            r.read()
+            return r.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self._local.conn = None
+            raise
+
+    def __call__(self, gtin, scan):
+        if scan:
+            # /scan answers for whatever the image holds; the GTIN lookup still follows
+            status = self._request("POST", "/scan", self.image)
+            if status not in (200, 404, 422):
+                return f"http_{status}"
+        status = self._request("GET", f"/product/{gtin}")
+        return {200: "ok", 404: "not_found"}.get(status, f"http_{status}")
+
+
+# ---------- driver ----------
+
+def run(target, args):
+    rng = random.Random(args.seed)
+    zipf = Zipf(args.catalog, args.zipf, rng)
+    latencies, outcomes = [], Counter()
+    lock = threading.Lock()
+
+    def one(scheduled, gtin, scan):
+        try:
+            outcome = target(gtin, scan)
+        except UpstreamError:
+            outcome = "upstream_error"
+        except Exception as e:  # the harness must keep going whatever the target does
+            outcome = type(e).__name__
+        elapsed = time.perf_counter() - scheduled
+        with lock:
+            latencies.append(elapsed)
+            outcomes[outcome] += 1
+
+    def next_request():
+        rank = zipf.sample()
+        gtin = unknown_gtin(rank) if rng.random() < args.miss_ratio else make_gtin(rank)
+        return gtin, rng.random() < args.scan_ratio
+
+    t0 = time.perf_counter()
+    end = t0 + args.duration
+    with ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="session") as pool:
+        if args.rate > 0:
+            # open loop: schedule on a Poisson clock, never wait for responses
+            scheduled = t0
+            while True:
+                scheduled += rng.expovariate(args.rate)
+                if scheduled >= end:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(one, scheduled, *next_request())
+        else:
+            # closed loop: each session sends its next request as soon as the last one returns
+            def session():
+                while time.perf_counter() < end:
+                    with lock:
+                        request = next_request()
+                    one(time.perf_counter(), *request)
+
+            for _ in range(args.concurrency):
+                pool.submit(session)
+    wall = time.perf_counter() - t0
+
+    latencies.sort()
+    total = sum(outcomes.values())
+    ok = outcomes.get("ok", 0) + outcomes.get("not_found", 0)
+    report = {
+        "requests": total,
+        "wall_s": wall,
+        "throughput_rps": total / wall if wall else 0.0,
+        "success_rps": ok / wall if wall else 0.0,
+        "latency_ms": {f"p{p}": percentile(latencies, p) * 1000 for p in PERCENTILES},
+        "outcomes": dict(outcomes.most_common()),
+        "error_rate": (total - ok) / total if total else 0.0,
+    }
+    report["latency_ms"]["max"] = (latencies[-1] * 1000) if latencies else 0.0
+    return report
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--target", choices=["inproc", "api"], default="inproc")
+    ap.add_argument("-c", "--concurrency", type=int, default=32, help="worker threads / sessions (default: 32)")
+    ap.add_argument("-r", "--rate", type=float, default=100, help="arrivals per second, 0 = closed loop (default: 100)")
+    ap.add_argument("-d", "--duration", type=float, default=20, help="seconds of load (default: 20)")
+    ap.add_argument("--catalog", type=int, default=10000, help="distinct products (default: 10000)")
+    ap.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of GTIN popularity (default: 1.1)")
+    ap.add_argument("--miss-ratio", type=float, default=0.05, help="requests for unknown GTINs (default: 0.05)")
+    ap.add_argument("--scan-ratio", type=float, default=0.0, help="requests that decode an image first")
+    ap.add_argument("--latency", type=float, default=0.05, help="stub latency, seconds (default: 0.05)")
+    ap.add_argument("--jitter", type=float, default=0.02, help="stub extra random latency, seconds")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub responses that are 503")
+    ap.add_argument("--no-cache", action="store_true", help="disable the product cache")
+    ap.add_argument("--workers", type=int, default=None, help="api target: decoder processes")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("-o", "--output", help="write the report as JSON here")
+    args = ap.parse_args(argv)
+
+    with open(SEED_IMAGE, "rb") as f:
+        image = f.read()
+
+    with StubOFF(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate) as stub, \
+            tempfile.TemporaryDirectory() as tmp:
+        source.set_client(OpenFoodFactsClient(base_url=stub.url, pool_size=args.concurrency))
+        source.set_product_cache(None if args.no_cache else ProductCache(os.path.join(tmp, "load.sqlite3")))
+        server = None
+        if args.target == "api":
+            import api
+            server = api.make_server("127.0.0.1", 0, workers=args.workers)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            target = APITarget(server.server_address[1], image)
+        else:
+            target = InProcTarget(image)
+        try:
+            report = run(target, args)
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+        cache = source.get_product_cache()
+        report["upstream_requests"] = stub.requests
+        report["product_cache"] = cache.stats() if cache else None
+        source.set_product_cache(None)
+
+    report["config"] = vars(args)
+    lat = report["latency_ms"]
+    mode = f"{args.rate:g}/s open loop" if args.rate > 0 else "closed loop"
+    print(f"{args.target}: {mode}, {args.concurrency} workers, {args.duration:g}s, catalog {args.catalog} "
+          f"(zipf {args.zipf:g}), stub {args.latency * 1000:.0f}ms +{args.jitter * 1000:.0f}ms, "
+          f"{args.error_rate:.0%} errors")
+    print(f"  requests   {report['requests']:>10}   throughput {report['throughput_rps']:8.1f}/s")
+    print(f"  latency ms p50 {lat['p50']:8.2f}   p95 {lat['p95']:8.2f}   p99 {lat['p99']:8.2f}   max {lat['max']:8.2f}")
+    print(f"  upstream   {report['upstream_requests']:>10}   error rate {report['error_rate']:.2%}")
+    for outcome, n in report["outcomes"].items():
+        print(f"    {outcome:<20} {n:>8}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Stage-by-stage benchmark suite for the scan-to-dashboard pipeline.
+
+    python benchmarks/run.py                        # run everything, print a table
+    python benchmarks/run.py -o results.json        # also write machine-readable results
+    python benchmarks/run.py --save-baseline        # store results as benchmarks/baseline.json
+    python benchmarks/run.py --compare              # diff against the stored baseline
+    python benchmarks/run.py --stages match render  # subset
+
+Stages:
+  decode  decode_barcode_from_image on barcode3.jpg re-encoded at several resolutions, plus
+          repeat uploads through the decode cache (results checked against uncached decodes)
+  lookup  reconcile() against the local OFF stub with injected latency (cold and cached)
+  match   normalize_token + risk matching (exact and fuzzy), synthetic ingredient lists x growing risk tables
+  render  dashboard fragment construction for analyzed products, and cached lookups
+
+Every case is timed `--repeat` times and reported as min/median/p90 ms. With
+--compare, a case whose median is more than --threshold slower than the
+baseline counts as a regression and the exit status is 1.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+BASELINE = os.path.join(HERE, "baseline.json")
+SEED_IMAGE = os.path.join(ROOT, "barcode3.jpg")
+DECODE_SIDES = (640, 1280, 2560, 4032)  # 4032 px ~ a 12 MP phone photo
+
+
+def measure(fn, repeat, warmup=1):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    samples.sort()
+    return {
+        "n": repeat,
+        "min_ms": samples[0],
+        "median_ms": statistics.median(samples),
+        "p90_ms": samples[min(len(samples) - 1, int(0.9 * len(samples)))],
+    }
+
+
+# ---------- stages ----------
+
+def bench_decode(repeat):
+    from PIL import Image
+    import source
+    from decode_cache import DecodeCache
+    from source import decode_barcode, decode_barcode_from_image
+
+    seed = Image.open(SEED_IMAGE).convert("RGB")
+    results = {}
+    uploads = []
+    source.set_decode_cache(None)
+    for side in DECODE_SIDES:
+        scale = side / max(seed.size)
+        img = seed.resize((round(seed.width * scale), round(seed.height * scale)), Image.BICUBIC)
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=90)
+        data = buf.getvalue()
+        uploads.append(data)
+        results[f"decode/{img.width}x{img.height}"] = measure(lambda: decode_barcode_from_image(data), repeat)
+
+    # a repeated upload must give exactly what a fresh decode gives, cache on or off
+    cache = DecodeCache()
+    for data in uploads + uploads:
+        if cache.get_or_decode(data, decode_barcode) != decode_barcode(data):
+            raise AssertionError("decode cache changed a result")
+    source.set_decode_cache(DecodeCache())
+    data = uploads[-1]
+    results[f"decode/repeat-upload@{DECODE_SIDES[-1]}"] = measure(lambda: decode_barcode_from_image(data), repeat)
+    source.set_decode_cache(None)
+    return results
+
+
+def bench_lookup(repeat, latency=0.02):
+    import source
+    from cache import ProductCache
+    from source import OpenFoodFactsClient
+    from stub_off import StubOFF, make_gtin
+
+    results = {}
+    gtins = [make_gtin(i) for i in range(repeat + 1)]
+    with StubOFF(latency=latency) as stub, tempfile.TemporaryDirectory() as tmp:
+        source.set_client(OpenFoodFactsClient(base_url=stub.url))
+        source.set_product_cache(None)
+        it = iter(gtins)
+        results[f"lookup/cold@{latency * 1000:.0f}ms"] = measure(lambda: source.reconcile(next(it)), repeat)
+
+        cache = ProductCache(os.path.join(tmp, "bench.sqlite3"))
+        source.set_product_cache(cache)
+        source.reconcile(gtins[0])
+        results["lookup/cached"] = measure(lambda: source.reconcile(gtins[0]), repeat)
+        source.set_product_cache(None)
+    return results
+
+
+def bench_match(repeat, sizes=(20, 500, 5000), ingredients=40):
+    from bench_matcher import synthetic_aliases, synthetic_tokens
+    from engine import Tables, analyze_product
+
+    rng = random.Random(0)
+    results = {}
+    for n in sizes:
+        alias_map = synthetic_aliases(n, rng)
+        tables = Tables.build(alias_map, {})
+        text = ", ".join(synthetic_tokens(alias_map, ingredients, rng))
+        product = {"ingredients_text": text}
+        results[f"match/{ingredients}ing@{len(alias_map)}aliases"] = measure(
+            lambda: analyze_product(product, tables), repeat)
+        # one dropped letter per token: every token misses the exact pass and goes fuzzy
+        typos = ", ".join(t[:2] + t[3:] for t in text.split(", "))
+        noisy = {"ingredients_text": typos}
+        results[f"match/{ingredients}ing@{len(alias_map)}aliases-fuzzy"] = measure(
+            lambda: analyze_product(noisy, tables, fuzzy=True), repeat)
+        results[f"match/build@{len(alias_map)}aliases"] = measure(
+            lambda: Tables.build(alias_map, {}), max(3, repeat // 10))
+    return results
+
+
+def bench_render(repeat, products=50):
+    from engine import analyze_product
+    from render import RenderCache, build_dashboard
+    from source import product_from_off
+    from stub_off import make_gtin, synthetic_product
+
+    analyses = [analyze_product(product_from_off(synthetic_product(make_gtin(i)))) for i in range(products)]
+
+    def build():
+        for a in analyses:
+            build_dashboard(a)
+
+    cache = RenderCache()
+    for i, a in enumerate(analyses):
+        cache.put(i, build_dashboard(a))
+
+    def cached():
+        for i in range(products):
+            cache.get(i)
+
+    return {f"render/{products}dashboards": measure(build, repeat),
+            f"render/{products}dashboards-cached": measure(cached, repeat)}
+
+
+STAGES = {"decode": bench_decode, "lookup": bench_lookup, "match": bench_match, "render": bench_render}
+
+
+# ---------- reporting ----------
+
+def compare(results, baseline, threshold):
+    regressions = []
+    print(f"\n{'case':<40} {'baseline':>10} {'now':>10} {'change':>8}")
+    for case, r in results.items():
+        base = baseline.get("results", {}).get(case)
+        if not base:
+            print(f"{case:<40} {'-':>10} {r['median_ms']:>10.3f} {'new':>8}")
+            continue
+        change = (r["median_ms"] - base["median_ms"]) / base["median_ms"]
+        flag = ""
+        if change > threshold:
+            regressions.append(case)
+            flag = "  REGRESSION"
+        print(f"{case:<40} {base['median_ms']:>10.3f} {r['median_ms']:>10.3f} {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    ap.add_argument("--repeat", type=int, default=30)
+    ap.add_argument("-o", "--output", help="write results JSON here")
+    ap.add_argument("--save-baseline", action="store_true", help=f"write results to {BASELINE}")
+    ap.add_argument("--compare", action="store_true", help="compare against the stored baseline")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--threshold", type=float, default=0.10, help="allowed median slowdown (default 0.10)")
+    args = ap.parse_args(argv)
+
+    results, skipped = {}, {}
+    for name in args.stages:
+        try:
+            results.update(STAGES[name](args.repeat))
+        except ImportError as e:
+            # e.g. no libzbar on this machine; the other stages still run
+            skipped[name] = str(e)
+            print(f"skipping {name}: {e}", file=sys.stderr)
+
+    print(f"{'case':<40} {'min ms':>10} {'median ms':>10} {'p90 ms':>10}")
+    for case, r in results.items():
+        print(f"{case:<40} {r['min_ms']:>10.3f} {r['median_ms']:>10.3f} {r['p90_ms']:>10.3f}")
+
+    doc = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} ({os.cpu_count()} cpus)",
+        "repeat": args.repeat,
+        "skipped": skipped,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+        print(f"baseline saved to {args.baseline}", file=sys.stderr)
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            sys.exit(f"no baseline at {args.baseline}; run with --save-baseline first")
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Local stand-in for the OpenFoodFacts v3 product API, for benchmarks and load tests.
+
+    python benchmarks/stub_off.py --port 8088 --latency 0.08 --error-rate 0.02
+
+Every 13-digit GTIN starting with "2" (store codes) or "0" (UPC-A, keyed
+with the leading 0 like OFF does) is "found" and gets a deterministic
+synthetic product; any other code answers 404 like the real API.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import os
+import sys
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gtin import check_digit  # noqa: E402
+
+INGREDIENTS = [
+    "water", "sugar", "wheat flour", "palm oil", "salt", "corn syrup", "soy lecithin",
+    "sodium benzoate", "citric acid", "natural flavour", "red 40", "yeast extract",
+    "xanthan gum", "monosodium glutamate", "partially hydrogenated oils", "cocoa butter",
+    "milk powder", "aspartame", "guar gum", "sodium nitrite", "enriched flour", "spices",
+]
+
+
+def make_gtin(i: int) -> str:
+    """
+    The i-th synthetic GTIN-13 the stub knows about (valid check digit). Odd
+    i are UPC-As with the leading 0, the common case for US products; even i
+    have prefix 2.
+    """
+    body = f"0{i:011d}" if i % 2 else f"2{i:011d}"
+    return body + str(check_digit(body))
+
+
+def synthetic_product(gtin: str) -> dict:
+    rng = random.Random(zlib.crc32(gtin.encode()))
+    return {
+        "product_name": f"Product {gtin[-5:]}",
+        "brands": rng.choice(["Acme", "Globex", "Initech", "Umbrella"]),
+        "ingredients_text": ", ".join(rng.sample(INGREDIENTS, rng.randint(4, 14))),
+        "serving_size": f"{rng.randint(20, 250)} g",
+        "image_front_url": f"https://images.example/{gtin}/front.jpg",
+        "image_nutrition_url": f"https://images.example/{gtin}/nutrition.jpg",
+        "nutriments": {
+            "energy-kcal_serving": rng.randint(50, 600), "energy-kcal_unit": "kcal",
+            "fat_serving": round(rng.uniform(0, 30), 1), "fat_unit": "g",
+            "saturated-fat_serving": round(rng.uniform(0, 12), 1), "saturated-fat_unit": "g",
+            "carbohydrates_serving": round(rng.uniform(0, 80), 1), "carbohydrates_unit": "g",
+            "sugars_serving": round(rng.uniform(0, 40), 1), "sugars_unit": "g",
+            "proteins_serving": round(rng.uniform(0, 25), 1), "proteins_unit": "g",
+            "sodium_serving": round(rng.uniform(0, 1.2), 3), "sodium_unit": "g",
+            "calcium_serving": round(rng.uniform(0, 300), 1), "calcium_unit": "mg",
+            "iron_serving": round(rng.uniform(0, 5), 2), "iron_unit": "mg",
+        },
+    }
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class StubOFF:
+    """Threaded stub server; use as a context manager or call start()/stop()."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                delay = stub.latency + (random.uniform(0, stub.jitter) if stub.jitter else 0)
+                if delay:
+                    time.sleep(delay)
+                gtin = self.path.split("?")[0].rstrip("/").rsplit("/", 1)[-1]
+                if stub.error_rate and random.random() < stub.error_rate:
+                    self._send(503, {"status": "failure", "errors": ["overloaded"]})
+                elif len(gtin) == 13 and gtin.startswith(("0", "2")):
+                    self._send(200, {"status": "success", "code": gtin, "product": synthetic_product(gtin)})
+                else:
+                    self._send(404, {"status": "failure", "code": gtin})
+
+            def _send(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = _Server((host, port), Handler)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8088)
+    ap.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    ap.add_argument("--jitter", type=float, default=0.0, help="extra uniform random latency, seconds")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    args = ap.parse_args(argv)
+    stub = StubOFF(args.host, args.port, args.latency, args.jitter, args.error_rate)
+    print(f"stub OpenFoodFacts on {stub.url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Look up (and analyze) a whole catalog of GTINs concurrently.
+
+    python bulk.py gtins.txt -o products.jsonl --concurrency 32 --rate 1.6
+    cat gtins.txt | python bulk.py - > products.jsonl
+
+GTINs are read one per line and streamed through reconcile() (offline index,
+product cache, then OpenFoodFacts) with a bounded number of lookups in flight.
+Upstream requests go through a token-bucket rate limiter, so throughput is
+capped by --rate rather than by sequential round trips. Found products are
+scored with engine.analyze_product and one JSON line is written per GTIN as
+soon as it completes.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import source
+from engine import analyze_product
+from source import OpenFoodFactsClient, RateLimiter, reconcile
+
+# OpenFoodFacts asks for at most 100 product reads per minute
+DEFAULT_RATE = 100 / 60
+
+
+def _lookup_one(gtin, lookup, analyze):
+    t0 = time.perf_counter()
+    record = {"gtin": gtin, "found": False, "product": None, "error": None}
+    try:
+        product = lookup(gtin)
+        record["found"] = product is not None
+        record["product"] = product
+        if analyze is not None and product is not None:
+            record["analysis"] = analyze(product)
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    return record
+
+
+async def bulk_lookup(gtins, concurrency: int = 16, lookup=reconcile, analyze=None):
+    """
+    Async generator yielding one record per GTIN in completion order.
+
+    gtins may be any (lazy) iterable; at most `concurrency` lookups run at
+    once and input is only consumed as workers free up. lookup and analyze
+    are blocking callables and run on a dedicated thread pool.
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bulk-lookup")
+    todo = asyncio.Queue(maxsize=concurrency * 2)
+    done = asyncio.Queue(maxsize=concurrency * 2)
+
+    async def feed():
+        try:
+            for gtin in gtins:
+                gtin = str(gtin).strip()
+                if gtin:
+                    await todo.put(gtin)
+        finally:
+            for _ in range(concurrency):
+                await todo.put(None)
+
+    async def work():
+        try:
+            while True:
+                gtin = await todo.get()
+                if gtin is None:
+                    break
+                await done.put(await loop.run_in_executor(executor, _lookup_one, gtin, lookup, analyze))
+        finally:
+            await done.put(None)
+
+    tasks = [asyncio.create_task(feed())] + [asyncio.create_task(work()) for _ in range(concurrency)]
+    try:
+        finished = 0
+        while finished < concurrency:
+            record = await done.get()
+            if record is None:
+                finished += 1
+            else:
+                yield record
+        await tasks[0]  # surface errors raised while reading the input
+    finally:
+        for task in tasks:
+            task.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def run(gtins, out, concurrency=16, analyze=None):
+    stats = {"gtins": 0, "found": 0, "missing": 0, "errors": 0}
+    async for record in bulk_lookup(gtins, concurrency=concurrency, analyze=analyze):
+        stats["gtins"] += 1
+        if record["error"]:
+            stats["errors"] += 1
+        elif record["found"]:
+            stats["found"] += 1
+        else:
+            stats["missing"] += 1
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    out.flush()
+    return stats
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("input", help="file with one GTIN per line, or - for stdin")
+    ap.add_argument("-o", "--output", help="JSONL output file (default: stdout)")
+    ap.add_argument("-c", "--concurrency", type=int, default=16, help="lookups in flight (default: 16)")
+    ap.add_argument("-r", "--rate", type=float, default=DEFAULT_RATE,
+                    help="max OpenFoodFacts requests per second (default: %(default).2f)")
+    ap.add_argument("--burst", type=int, default=1, help="rate limiter burst size (default: 1)")
+    ap.add_argument("--no-analyze", action="store_true", help="only look products up, skip the analysis")
+    ap.add_argument("--fuzzy", action="store_true", help="also match misspelled risk-list ingredients")
+    ap.add_argument("--base-url", default=source.OFF_BASE_URL, help="OpenFoodFacts base URL")
+    args = ap.parse_args(argv)
+
+    source.set_client(OpenFoodFactsClient(
+        base_url=args.base_url,
+        pool_size=args.concurrency,
+        rate_limiter=RateLimiter(args.rate, burst=args.burst) if args.rate > 0 else None,
+    ))
+
+    inp = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8")
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    t0 = time.perf_counter()
+    try:
+        analyze = None if args.no_analyze else (lambda product: analyze_product(product, fuzzy=args.fuzzy).to_dict())
+        stats = asyncio.run(run(inp, out, concurrency=args.concurrency, analyze=analyze))
+    finally:
+        if inp is not sys.stdin:
+            inp.close()
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - t0
+    print(f"{stats['gtins']} GTINs in {elapsed:.1f}s ({stats['gtins'] / max(elapsed, 1e-9):.1f}/s): "
+          f"{stats['found']} found, {stats['missing']} missing, {stats['errors']} errors", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
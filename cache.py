@@ -0,0 +1,129 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+class ProductCache:
+    """
+    SQLite-backed product cache keyed by GTIN.
+
+    - Fresh entries (younger than ttl) are returned directly.
+    - Stale entries (up to ttl + stale_ttl old) are returned immediately while
+      a background thread refreshes them (stale-while-revalidate).
+    - "Not found" results are cached too, for negative_ttl seconds.
+    - The table is capped at max_entries rows, evicting least recently used.
+    """
+
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600, negative_ttl: float = 6 * 3600,
+                 stale_ttl: float = 30 * 24 * 3600, max_entries: int = 5000):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._stats = {"hits": 0, "stale_hits": 0, "negative_hits": 0, "misses": 0,
+                       "evictions": 0, "refreshes": 0, "refresh_errors": 0}
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS products (
+                gtin TEXT PRIMARY KEY,
+                payload TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS products_accessed ON products (accessed_at)")
+
+    # ---------- raw access ----------
+
+    def lookup(self, gtin: str):
+        """Return (found, product, age_seconds). product is None for a cached "not found"."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, fetched_at FROM products WHERE gtin = ?", (gtin,)).fetchone()
+            if row is None:
+                return False, None, None
+            now = time.time()
+            self._conn.execute("UPDATE products SET accessed_at = ? WHERE gtin = ?", (now, gtin))
+        payload, fetched_at = row
+        return True, (json.loads(payload) if payload is not None else None), now - fetched_at
+
+    def store(self, gtin: str, product):
+        now = time.time()
+        payload = json.dumps(product) if product is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO products (gtin, payload, fetched_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (gtin, payload, now, now))
+            self._evict()
+
+    def _evict(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM products").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM products WHERE gtin IN "
+                "(SELECT gtin FROM products ORDER BY accessed_at LIMIT ?)", (excess,))
+            self._stats["evictions"] += excess
+
+    def invalidate(self, gtin: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM products WHERE gtin = ?", (gtin,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM products")
+
+    # ---------- read-through ----------
+
+    def get_or_fetch(self, gtin: str, fetch):
+        """
+        Return the cached product for gtin, calling fetch(gtin) on a miss.
+        Errors raised by fetch are not cached and propagate to the caller.
+        """
+        found, product, age = self.lookup(gtin)
+        if found:
+            ttl = self.ttl if product is not None else self.negative_ttl
+            if age < ttl:
+                self._count("hits" if product is not None else "negative_hits")
+                return product
+            if product is not None and age < ttl + self.stale_ttl:
+                self._count("stale_hits")
+                self._refresh_in_background(gtin, fetch)
+                return product
+        self._count("misses")
+        product = fetch(gtin)
+        self.store(gtin, product)
+        return product
+
+    def _refresh_in_background(self, gtin, fetch):
+        with self._lock:
+            if gtin in self._refreshing:
+                return
+            self._refreshing.add(gtin)
+
+        def run():
+            try:
+                self.store(gtin, fetch(gtin))
+                self._count("refreshes")
+            except Exception:
+                # keep serving the stale copy; the next stale hit retries
+                self._count("refresh_errors")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(gtin)
+
+        threading.Thread(target=run, name=f"product-refresh-{gtin}", daemon=True).start()
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM products").fetchone()
+            return dict(self._stats, size=size)
@@ -0,0 +1,77 @@
+"""
+Content-addressed cache of barcode decode results.
+
+Re-uploading the same photo (or re-sending a camera frame after a network
+error) used to run the whole zbar ladder again. DecodeCache keys results by
+a BLAKE2 hash of the uploaded bytes, so an identical upload skips zbar
+entirely; the map is LRU-bounded. Only byte-identical uploads share a
+result: images of two different barcodes look alike at thumbnail scale, so
+a similarity match could hand back another product's GTIN.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from singleflight import SingleFlight
+from tracing import span
+
+_MISSING = object()
+
+
+def content_key(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class DecodeCache:
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._exact = OrderedDict()       # content key -> Barcode or None
+        self._flights = SingleFlight()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get_or_decode(self, data: bytes, decode):
+        """decode(data) through the cache; concurrent decodes of the same bytes run once."""
+        with span("decode_cache.hash"):
+            key = content_key(data)
+        found = self._get_exact(key)
+        if found is not _MISSING:
+            return found
+        return self._flights.do(key, self._fill, key, data, decode)
+
+    def _fill(self, key, data, decode):
+        found = self._get_exact(key, count=False)
+        if found is not _MISSING:
+            return found
+        with self._lock:
+            self._stats["misses"] += 1
+        found = decode(data)
+        self._put(key, found)
+        return found
+
+    def _get_exact(self, key, count=True):
+        with self._lock:
+            found = self._exact.get(key, _MISSING)
+            if found is not _MISSING:
+                self._exact.move_to_end(key)
+                if count:
+                    self._stats["hits"] += 1
+            return found
+
+    def _put(self, key, value):
+        with self._lock:
+            self._exact[key] = value
+            self._exact.move_to_end(key)
+            while len(self._exact) > self.max_entries:
+                self._exact.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._exact.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            hit_rate = self._stats["hits"] / lookups if lookups else 0.0
+            return dict(self._stats, size=len(self._exact), hit_rate=round(hit_rate, 4))
@@ -0,0 +1,304 @@
+"""
+Headless BiteRight analysis: ingredient risk matching and per-serving
+nutrition with %DV. No Streamlit imports, so it can run in workers, batch
+jobs and profilers; main.py only renders the Analysis it returns.
+"""
+import hashlib
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from functools import cached_property
+from typing import Dict, List, Optional, Tuple
+
+from matcher import UNKNOWN, FuzzyMatcher, RiskMatcher
+from tracing import traced
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DV_CSV = os.path.join(HERE, "daily_values.csv")
+CSV = os.path.join(HERE, "harmful_ingredients_risk_list.csv")
+
+RISK_LEVELS = ["High", "Moderate", "Low", "Unknown"]
+SEVERITY_ORDER = {"High": 0, "Moderate": 1, "Low": 2}
+
+RISK_COLORS = {
+    "High": {"bg": "#FEE2E2", "border": "#991B1B", "text": "#991B1B"},  # red-ish
+    "Moderate": {"bg": "#FEF3C7", "border": "#92400E", "text": "#92400E"},  # amber-ish
+    "Low": {"bg": "#ECFDF5", "border": "#065F46", "text": "#065F46"},  # green-ish
+    "Unknown": {"bg": "#F3F4F6", "border": "#E5E7EB", "text": "#374151"},  # gray
+}
+
+# Map OFF keys to DV names in your CSV
+DV_KEY_MAP = {
+    "energy-kcal": "calories",
+    "fat": "total fat",
+    "saturated-fat": "saturated fat",
+    "sugars": "free sugars",  # using Free Sugars as DV benchmark
+    "sodium": "sodium",
+}
+
+MACRO_KEYS = {
+    "energy-kcal": ("Energy", "kcal"),
+    "carbohydrates": ("Carbs", "g"),
+    "sugars": ("Sugars", "g"),
+    "added-sugars": ("Added sugars", "g"),
+    "proteins": ("Protein", "g"),
+    "fat": ("Fat", "g"),
+    "saturated-fat": ("Sat. Fat", "g"),
+    "fiber": ("Fiber", "g"),
+    "sodium": ("Sodium", "g"),
+}
+
+MICRO_KEYS = {
+    "potassium": ("Potassium", "mg"),
+    "magnesium": ("Magnesium", "mg"),
+    "calcium": ("Calcium", "mg"),
+    "phosphorus": ("Phosphorus", "mg"),
+    "iron": ("Iron", "mg"),
+    "zinc": ("Zinc", "mg"),
+    "iodine": ("Iodine", "µg"),
+    "selenium": ("Selenium", "µg"),
+    "copper": ("Copper", "mg"),
+    "manganese": ("Manganese", "mg"),
+    "vitamin-a": ("Vitamin A", "µg"),
+    "vitamin-d": ("Vitamin D", "µg"),
+    "vitamin-e": ("Vitamin E", "mg"),
+    "vitamin-k": ("Vitamin K", "µg"),
+    "vitamin-c": ("Vitamin C", "mg"),
+    "vitamin-b1": ("Vitamin B1 (Thiamin)", "mg"),
+    "vitamin-b2": ("Vitamin B2 (Riboflavin)", "mg"),
+    "vitamin-b3": ("Vitamin B3 (Niacin)", "mg"),
+    "vitamin-b6": ("Vitamin B6", "mg"),
+    "vitamin-b12": ("Vitamin B12", "µg"),
+    "folates": ("Folate", "µg"),
+    "choline": ("Choline", "mg"),
+}
+
+# mass conversions
+UNIT_SCALE = {
+    ("g", "mg"): 1000.0, ("mg", "g"): 1 / 1000.0,
+    ("g", "µg"): 1_000_000.0, ("µg", "g"): 1 / 1_000_000.0,
+    ("mg", "µg"): 1000.0, ("µg", "mg"): 1 / 1000.0,
+}
+
+_INGREDIENT_SPLIT = re.compile(r"[;,()]")
+_APOSTROPHES = re.compile(r"[’']")
+_PUNCTUATION = re.compile(r"[^0-9a-zA-Z\-\+\(\) %]")
+_SPACES = re.compile(r"\s+")
+_INTAKE = re.compile(r"^\s*([0-9]+(?:\.[0-9]+)?)\s*([a-zµ]+)\s*$")
+
+
+# ---------- tables ----------
+
+_file_versions = {}
+_file_versions_lock = threading.Lock()
+
+
+def file_version(path: str) -> str:
+    """Short content hash of a data file; only re-hashed when its mtime or size changes."""
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _file_versions_lock:
+        cached = _file_versions.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    with open(path, "rb") as f:
+        version = hashlib.sha256(f.read()).hexdigest()[:12]
+    with _file_versions_lock:
+        _file_versions[path] = (stamp, version)
+    return version
+
+
+def parse_intake(s: str):
+    s = str(s).strip().lower()
+    # split number and unit (supports mg, g, µg, mcg, kcal)
+    m = _INTAKE.match(s)
+    if not m:
+        return None, ""
+    val = float(m.group(1))
+    unit = m.group(2)
+    # normalize micrograms unit
+    if unit == "mcg":
+        unit = "µg"
+    return val, unit
+
+
+@dataclass(frozen=True)
+class Tables:
+    """Everything analyze_product needs, built once and shared between calls."""
+    matcher: RiskMatcher
+    daily_values: Dict[str, Tuple[float, str]]
+    # OFF key -> (dv_value, dv_unit), resolved through DV_KEY_MAP up front
+    dv_by_key: Dict[str, Tuple[float, str]] = field(default_factory=dict)
+    # content hashes of the source CSVs ("" when built from in-memory data)
+    risk_version: str = ""
+    dv_version: str = ""
+
+    @classmethod
+    def build(cls, alias_map: dict, daily_values: dict, risk_version: str = "", dv_version: str = "",
+              matcher: RiskMatcher = None) -> "Tables":
+        dv_by_key = {key: daily_values[name] for key, name in DV_KEY_MAP.items() if name in daily_values}
+        return cls(matcher or RiskMatcher(alias_map), daily_values, dv_by_key, risk_version, dv_version)
+
+    @property
+    def version(self) -> str:
+        return f"{self.risk_version}-{self.dv_version}"
+
+    @cached_property
+    def fuzzy(self) -> FuzzyMatcher:
+        # only built the first time fuzzy matching is asked for
+        return FuzzyMatcher(self.matcher.alias_map)
+
+
+def default_tables() -> Tables:
+    """The process-wide tables, loaded from the compiled artifact (see tables.py)."""
+    from tables import get_table_store  # tables imports engine
+    return get_table_store().current()
+
+
+# ---------- helpers ----------
+
+def normalize_token(s: str):
+    # keep letters, numbers, spaces, plus/minus & parentheses content; drop commas/periods etc.
+    s = _APOSTROPHES.sub("'", s)           # normalize apostrophes
+    s = _PUNCTUATION.sub(" ", s)  # remove most punctuation, keep () + -
+    return _SPACES.sub(" ", s).strip().lower()
+
+
+def split_ingredients(ingredients_text: str) -> List[str]:
+    return [t.strip() for t in _INGREDIENT_SPLIT.split(ingredients_text or "") if t.strip()]
+
+
+def get_serving(nutriments, key_base, fallback_unit=""):
+    val = nutriments.get(f"{key_base}_serving")
+    unit = nutriments.get(f"{key_base}_unit", fallback_unit)
+    if val is None:
+        return None, unit
+    try:
+        val = round(val, 2)
+    except Exception:
+        pass
+    return val, unit
+
+
+def convert_units(value: float, from_unit: str, to_unit: str) -> float:
+    """Convert between g, mg, µg, and kcal (identity if same)."""
+    u = from_unit.lower()
+    v = to_unit.lower()
+    if u == v:
+        return value
+    if (u, v) in UNIT_SCALE:
+        return value * UNIT_SCALE[(u, v)]
+    # kcal kept as-is (no conversion with mass)
+    return value  # fallback
+
+
+def pct_dv(value: float, unit: str, dv_value: float, dv_unit: str) -> float:
+    """Return percentage of daily value (0-100+) with unit conversion."""
+    try:
+        val_same_unit = convert_units(value, unit or dv_unit, dv_unit)
+        return (val_same_unit / dv_value) * 100.0
+    except Exception:
+        return None
+
+
+# ---------- results ----------
+
+@dataclass(frozen=True)
+class IngredientMatch:
+    display: str
+    category: str
+    risk: str
+    concern: str
+    # 1.0 for exact/substring matches, the similarity for fuzzy ones, 0.0 when unmatched
+    confidence: float = 1.0
+
+
+@dataclass(frozen=True)
+class Nutrient:
+    key: str
+    label: str
+    value: object
+    unit: str
+    kind: str  # "macro" or "micro"
+    pct_dv: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class Analysis:
+    product_name: Optional[str]
+    brand: Optional[str]
+    serving_size: Optional[str]
+    image_front_url: Optional[str]
+    image_nutri_url: Optional[str]
+    ingredients: List[IngredientMatch]
+    risk_counts: Dict[str, int]
+    macros: List[Nutrient]
+    micros: List[Nutrient]
+
+    @property
+    def risky(self) -> List[IngredientMatch]:
+        """Ingredients from the risk list (High/Moderate/Low), most severe first."""
+        hits = [i for i in self.ingredients if i.risk in SEVERITY_ORDER]
+        return sorted(hits, key=lambda i: (SEVERITY_ORDER[i.risk], i.display))
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+# ---------- engine ----------
+
+@traced("match_ingredients")
+def match_ingredients(ingredients_text: str, tables: Tables, fuzzy: bool = False) -> List[IngredientMatch]:
+    matched = []
+    for raw in split_ingredients(ingredients_text):
+        token = normalize_token(raw)
+        # exact label, else the longest alias contained in the token
+        hit = tables.matcher.match(token)
+        confidence = 1.0 if hit is not UNKNOWN else 0.0
+        if hit is UNKNOWN and fuzzy:
+            # misspellings / OCR noise: closest alias above the similarity threshold
+            hit, confidence = tables.fuzzy.match(token)
+        cat, risk, concern = hit
+        matched.append(IngredientMatch(raw, cat, risk, concern, confidence))
+    return matched
+
+
+def extract_nutrients(nutriments: dict, keys: dict, kind: str, tables: Tables) -> List[Nutrient]:
+    out = []
+    for key, (label, default_unit) in keys.items():
+        val, unit = get_serving(nutriments, key, default_unit)
+        if val is None:
+            continue
+        pct = None
+        # only macros carry a %DV in the dashboard
+        if kind == "macro" and key in tables.dv_by_key:
+            dv_val, dv_unit = tables.dv_by_key[key]
+            pct = pct_dv(val, unit, dv_val, dv_unit)
+        out.append(Nutrient(key, label, val, unit, kind, pct))
+    return out
+
+
+@traced("analyze_product")
+def analyze_product(data: dict, tables: Tables = None, fuzzy: bool = False) -> Analysis:
+    """Analyze a product dict as returned by source.reconcile(); fuzzy also catches misspelled aliases."""
+    tables = tables or default_tables()
+    ingredients = match_ingredients((data.get("ingredients_text") or "").strip(), tables, fuzzy)
+
+    risk_counts = Counter(item.risk for item in ingredients)
+    for lvl in RISK_LEVELS:
+        risk_counts.setdefault(lvl, 0)
+
+    nut = data.get("nutriments") or {}
+    return Analysis(
+        product_name=data.get("product_name") or None,
+        brand=data.get("brand") or None,
+        serving_size=data.get("serving_size") or None,
+        image_front_url=data.get("image_front_url") or None,
+        image_nutri_url=data.get("image_nutri_url") or None,
+        ingredients=ingredients,
+        risk_counts=dict(risk_counts),
+        macros=extract_nutrients(nut, MACRO_KEYS, "macro", tables),
+        micros=extract_nutrients(nut, MICRO_KEYS, "micro", tables),
+    )
@@ -0,0 +1,119 @@
+"""
+GTIN helpers: GS1 check digits, UPC-E expansion and canonical forms.
+
+OpenFoodFacts keys products by GTIN-13 for EAN-13 and UPC-A (UPC-A gets a
+leading 0), keeps EAN-8 codes as 8 digits, and only uses 14 digits for
+real GTIN-14s.
+"""
+import re
+
+_SEPARATORS = re.compile(r"[\s\-]")
+
+
+class InvalidGTIN(ValueError):
+    """Input is not a well-formed GTIN (bad characters, length or check digit)."""
+
+
+def check_digit(body: str) -> int:
+    """GS1 mod-10 check digit for the digits preceding it."""
+    total = 0
+    # weights alternate 3,1,3,... starting from the rightmost body digit
+    for i, ch in enumerate(reversed(body)):
+        total += int(ch) * (3 if i % 2 == 0 else 1)
+    return (10 - total % 10) % 10
+
+
+def has_valid_check_digit(code: str) -> bool:
+    return code.isdigit() and len(code) >= 2 and check_digit(code[:-1]) == int(code[-1])
+
+
+def expand_upce(code: str) -> str:
+    """
+    Expand a UPC-E code to its 12-digit UPC-A form.
+
+    Accepts 6 digits (number system 0, no check digit), 7 digits (number
+    system + 6) or the full 8 digits; the check digit is recomputed.
+    """
+    if not code.isdigit() or len(code) not in (6, 7, 8):
+        raise InvalidGTIN(f"not a UPC-E code: {code!r}")
+    if len(code) == 6:
+        ns, d = "0", code
+    else:
+        ns, d = code[0], code[1:7]
+    if ns not in "01":
+        raise InvalidGTIN(f"UPC-E number system must be 0 or 1: {code!r}")
+    last = d[5]
+    if last in "012":
+        body = d[0:2] + last + "0000" + d[2:5]
+    elif last == "3":
+        body = d[0:3] + "00000" + d[3:5]
+    elif last == "4":
+        body = d[0:4] + "00000" + d[4]
+    else:
+        body = d[0:5] + "0000" + last
+    upca = ns + body
+    return upca + str(check_digit(upca))
+
+
+def is_valid_upce(code: str) -> bool:
+    try:
+        return len(code) == 8 and expand_upce(code)[-1] == code[-1]
+    except InvalidGTIN:
+        return False
+
+
+def canonical(code: str) -> str:
+    """Canonical OFF key for a valid EAN-8 / UPC-A / EAN-13 / GTIN-14."""
+    if len(code) == 8:
+        return code
+    if len(code) == 14 and code.startswith("0"):
+        code = code[1:]
+    return code.zfill(13) if len(code) <= 13 else code
+
+
+def clean(raw: str) -> str:
+    code = _SEPARATORS.sub("", str(raw or ""))
+    if not code.isdigit():
+        raise InvalidGTIN(f"barcode must contain only digits: {raw!r}")
+    return code
+
+
+def normalize_decoded(data: str, symbology: str) -> str:
+    """Normalize a zbar result to the canonical key (UPC-E is expanded first)."""
+    if symbology == "UPCE":
+        return canonical(expand_upce(data))
+    if has_valid_check_digit(data):
+        return canonical(data)
+    return data
+
+
+def candidates(raw: str) -> list:
+    """
+    Canonical lookup keys for every valid reading of user input, most likely
+    first; only 8-digit input can have more than one (EAN-8 vs UPC-E).
+    Raises InvalidGTIN when no reading has a valid check digit.
+    """
+    code = clean(raw)
+    out = []
+    if len(code) in (6, 7):
+        # UPC-E typed without number system and/or check digit
+        out.append(canonical(expand_upce(code)))
+    elif len(code) == 8:
+        # 8 digits is either an EAN-8 or a UPC-E; keep every reading whose check digit holds
+        if has_valid_check_digit(code):
+            out.append(code)
+        if is_valid_upce(code):
+            out.append(canonical(expand_upce(code)))
+    elif len(code) in (12, 13, 14) and has_valid_check_digit(code):
+        out.append(canonical(code))
+    if not out:
+        raise InvalidGTIN(f"not a valid EAN/UPC barcode: {raw!r}")
+    return list(dict.fromkeys(out))
+
+
+def fallbacks(key: str) -> list:
+    """Other spellings of a canonical key, worth a lookup only when the key itself is not found."""
+    # some OFF entries were created from the 12-digit UPC-A form
+    if len(key) == 13 and key.startswith("0"):
+        return [key[1:]]
+    return []
@@ -0,0 +1,200 @@
+"""
+Server-side product image proxy.
+
+OpenFoodFacts images are often several MB, while the dashboard shows them
+350px high. ImageProxy downloads each image once, stores a right-sized
+WebP (JPEG if Pillow lacks WebP) thumbnail on disk, and hands those bytes
+to st.image, which serves them from Streamlit's media endpoint.
+The disk cache is LRU-bounded by total size.
+"""
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from PIL import Image, ImageOps, features
+
+from singleflight import SingleFlight
+from tracing import span
+
+IMAGE_CACHE_DIR = os.environ.get("BITERIGHT_IMAGE_CACHE", "image_cache")
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("BITERIGHT_IMAGE_CACHE_BYTES", 200 * 1024 * 1024))
+# the dashboard renders images 350px high; 2x keeps them sharp on high-DPI phones
+THUMB_HEIGHT = 700
+OFF_IMAGE_HOSTS = ("openfoodfacts.org", "openfoodfacts.net", "openfoodfacts.ovh")
+
+
+class ImageProxy:
+    def __init__(self, cache_dir: str = IMAGE_CACHE_DIR, max_bytes: int = IMAGE_CACHE_MAX_BYTES,
+                 height: int = THUMB_HEIGHT, quality: int = 80, timeout: float = 10,
+                 max_source_bytes: int = 25 * 1024 * 1024, allowed_hosts=OFF_IMAGE_HOSTS,
+                 session: requests.Session = None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.height = height
+        self.quality = quality
+        self.timeout = timeout
+        self.max_source_bytes = max_source_bytes
+        # only fetch from known image hosts (None allows any http(s) URL)
+        self.allowed_hosts = allowed_hosts
+        self.format = "WEBP" if features.check("webp") else "JPEG"
+        self.mime = "image/webp" if self.format == "WEBP" else "image/jpeg"
+        self.session = session or requests.Session()
+        self._flights = SingleFlight()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "errors": 0, "bytes_in": 0, "bytes_out": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = sum(size for _, size, _ in self._entries())
+
+    # ---------- public ----------
+
+    def thumbnail(self, url: str, height: int = None):
+        """Thumbnail bytes for url, or None if it cannot be fetched or decoded."""
+        if not self._allowed(url):
+            return None
+        height = height or self.height
+        path = self._path(url, height)
+        data = self._read(path)
+        if data is not None:
+            self._count("hits")
+            return data
+        return self._flights.do(path, self._build, url, height, path)
+
+    def thumbnails(self, urls, height: int = None) -> list:
+        """thumbnail() for each URL, fetched side by side; None where a URL is missing or fails."""
+        wanted = [url for url in urls if url]
+        if len(wanted) < 2:
+            return [self.thumbnail(url, height) if url else None for url in urls]
+        with ThreadPoolExecutor(max_workers=len(wanted), thread_name_prefix="image-proxy") as pool:
+            futures = [pool.submit(self.thumbnail, url, height) if url else None for url in urls]
+        return [f.result() if f else None for f in futures]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, cached_bytes=self._size)
+
+    # ---------- internals ----------
+
+    def _allowed(self, url):
+        parsed = urlparse(url or "")
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            return False
+        if self.allowed_hosts is None:
+            return True
+        host = parsed.hostname.lower()
+        return any(host == h or host.endswith("." + h) for h in self.allowed_hosts)
+
+    def _path(self, url, height):
+        key = hashlib.sha256(f"{url}|{height}|{self.format}|{self.quality}".encode()).hexdigest()
+        ext = ".webp" if self.format == "WEBP" else ".jpg"
+        return os.path.join(self.cache_dir, key[:2], key + ext)
+
+    def _read(self, path):
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)  # mtime doubles as the LRU clock
+        except OSError:
+            pass
+        return data
+
+    def _build(self, url, height, path):
+        # another caller may have finished this thumbnail while we queued
+        data = self._read(path)
+        if data is not None:
+            self._count("hits")
+            return data
+        self._count("misses")
+        try:
+            with span("image_proxy.fetch"):
+                raw = self._download(url)
+            with span("image_proxy.resize"):
+                data = self._resize(raw, height)
+        except (requests.RequestException, OSError, ValueError, Image.DecompressionBombError):
+            self._count("errors")
+            return None
+        self._write(path, data)
+        with self._lock:
+            self._stats["bytes_in"] += len(raw)
+            self._stats["bytes_out"] += len(data)
+        return data
+
+    def _download(self, url):
+        with self.session.get(url, timeout=self.timeout, stream=True) as r:
+            r.raise_for_status()
+            buf = io.BytesIO()
+            for chunk in r.iter_content(64 * 1024):
+                buf.write(chunk)
+                if buf.tell() > self.max_source_bytes:
+                    raise ValueError(f"image larger than {self.max_source_bytes} bytes: {url}")
+            return buf.getvalue()
+
+    def _resize(self, raw, height):
+        img = Image.open(io.BytesIO(raw))
+        if img.height > height:
+            width = max(1, img.width * height // img.height)
+            # JPEG: decode straight at a reduced scale instead of the full-size bitmap
+            img.draft("RGB", (width, height))
+        img = ImageOps.exif_transpose(img)
+        if img.height > height:
+            img.thumbnail((max(1, img.width * height // img.height), height), Image.LANCZOS)
+
+        out = io.BytesIO()
+        if self.format == "JPEG":
+            img.convert("RGB").save(out, format="JPEG", quality=self.quality, optimize=True, progressive=True)
+        else:
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+            img.save(out, format="WEBP", quality=self.quality, method=4)
+        return out.getvalue()
+
+    def _write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self._size += len(data)
+            over = self._size > self.max_bytes
+        if over:
+            self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def _evict(self):
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda e: e[2])
+            size = sum(e[1] for e in entries)
+            # trim to 90% so we do not evict on every write near the limit
+            target = self.max_bytes * 0.9
+            for path, nbytes, _ in entries:
+                if size <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                size -= nbytes
+                self._stats["evictions"] += 1
+            self._size = size
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
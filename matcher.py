@@ -0,0 +1,245 @@
+import re
+from collections import deque
+
+UNKNOWN = ("—", "Unknown", "Not in risk list")
+
+
+class RiskMatcher:
+    """
+    Aho-Corasick automaton over the aliases of the risk list.
+
+    Built once from the alias_map returned by tables.parse_risk_csv, then each
+    ingredient token is matched in a single pass over its characters.
+    Results are the same as the old per-token scan: an exact label wins,
+    otherwise the longest alias contained in the token (ties broken by
+    the alias order in the CSV).
+    """
+
+    def __init__(self, alias_map: dict):
+        self.alias_map = dict(alias_map)
+        self._goto = [{}]      # state -> {char: next_state}
+        self._fail = [0]
+        self._out = [None]     # state -> best (len, -rank, alias) ending here
+        for rank, alias in enumerate(self.alias_map):
+            if alias:
+                self._add(alias, rank)
+        self._build_links()
+
+    def state(self) -> tuple:
+        """The built automaton as plain lists, dicts and tuples (see from_state)."""
+        return self._goto, self._fail, self._out
+
+    @classmethod
+    def from_state(cls, alias_map: dict, state: tuple) -> "RiskMatcher":
+        """A matcher for alias_map from a state() of the same map, without rebuilding the automaton."""
+        matcher = cls.__new__(cls)
+        matcher.alias_map = dict(alias_map)
+        matcher._goto, matcher._fail, matcher._out = state
+        return matcher
+
+    def _add(self, alias: str, rank: int):
+        state = 0
+        for ch in alias:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(None)
+            state = nxt
+        self._out[state] = (len(alias), -rank, alias)
+
+    def _build_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                # fold the best output reachable through the fail chain into this state
+                inherited = self._out[self._fail[nxt]]
+                if inherited is not None and (self._out[nxt] is None or inherited > self._out[nxt]):
+                    self._out[nxt] = inherited
+
+    def longest_alias(self, text: str):
+        """Return the longest alias occurring in text, or None."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        best = None
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            hit = out[state]
+            if hit is not None and (best is None or hit > best):
+                best = hit
+        return best[2] if best else None
+
+    def match(self, token_norm: str):
+        """Return (category, risk, concern) for a normalized token."""
+        # exact label match
+        if token_norm in self.alias_map:
+            return self.alias_map[token_norm]
+        alias = self.longest_alias(token_norm)
+        if alias is not None:
+            return self.alias_map[alias]
+        return UNKNOWN
+
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+_PARENTHESIZED = re.compile(r"\(([^)]*)\)")
+
+
+def _compact(text: str) -> str:
+    # "E-129", "e 129" and "e129" all compare equal; spacing is OCR noise too
+    return _NON_ALNUM.sub("", text.lower())
+
+
+def _trigrams(compact: str) -> set:
+    padded = f"${compact}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _alias_forms(alias: str) -> list:
+    """The alias plus, for "titanium dioxide (e171)", both "titanium dioxide" and "e171"."""
+    forms = [alias]
+    inner = _PARENTHESIZED.findall(alias)
+    if inner:
+        forms.append(_PARENTHESIZED.sub(" ", alias))
+        forms.extend(inner)
+    return forms
+
+
+def bounded_levenshtein(a: str, b: str, max_dist: int) -> int:
+    """Edit distance between a and b, or max_dist + 1 as soon as it must exceed max_dist."""
+    if abs(len(a) - len(b)) > max_dist:
+        return max_dist + 1
+    if len(a) > len(b):
+        a, b = b, a
+    prev = list(range(len(a) + 1))
+    for i, cb in enumerate(b, 1):
+        cur = [i]
+        for j, ca in enumerate(a, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > max_dist:
+            return max_dist + 1
+        prev = cur
+    return min(prev[-1], max_dist + 1)
+
+
+class FuzzyMatcher:
+    """
+    Typo-tolerant matching of ingredient tokens against the risk-list aliases.
+
+    Aliases are compacted (lowercase, letters and digits only) and indexed
+    by padded character trigram. A query looks up every run of up to
+    max_words consecutive words of the token, keeps aliases sharing enough
+    trigrams (Dice coefficient), and verifies the best few with a bounded
+    edit distance. Similarity is 1 - distance / longer length; matches below
+    threshold are ignored.
+
+    A close whole string is not enough: "sodium citrate" is one letter from
+    "sodium nitrate". Inexact matches must also agree word by word, each
+    differing word within its own edit budget and keeping its first letter.
+    """
+
+    def __init__(self, alias_map: dict, threshold: float = 0.8, prefilter: float = 0.4,
+                 max_candidates: int = 5):
+        self.alias_map = dict(alias_map)
+        self.threshold = threshold
+        self.prefilter = prefilter
+        self.max_candidates = max_candidates
+        self._aliases = []     # id -> (alias, compact, trigram count, compact words)
+        self._index = {}       # trigram -> [alias ids]
+        self.max_words = 1
+        for alias in self.alias_map:
+            for form in _alias_forms(alias):
+                compact = _compact(form)
+                if not compact:
+                    continue
+                grams = _trigrams(compact)
+                for gram in grams:
+                    self._index.setdefault(gram, []).append(len(self._aliases))
+                words = tuple(w for w in map(_compact, form.split()) if w)
+                self._aliases.append((alias, compact, len(grams), words))
+                self.max_words = max(self.max_words, len(form.split()))
+        lengths = [len(c) for _, c, _, _ in self._aliases] or [0]
+        self._min_len, self._max_len = min(lengths), max(lengths)
+
+    def best(self, token_norm: str):
+        """Return (alias, similarity) for the closest alias at or above threshold, or None."""
+        words = token_norm.split()
+        best = None
+        seen = set()
+        for i in range(len(words)):
+            for j in range(i + 1, min(len(words), i + self.max_words) + 1):
+                span_words = tuple(w for w in map(_compact, words[i:j]) if w)
+                compact = "".join(span_words)
+                if span_words in seen:
+                    continue
+                seen.add(span_words)
+                # a span this far outside the alias lengths cannot reach the threshold
+                if len(compact) < self._min_len * self.threshold:
+                    continue
+                if len(compact) * self.threshold > self._max_len:
+                    break
+                hit = self._best_for(compact, span_words)
+                if hit is not None and (best is None or hit[1] > best[1]):
+                    best = hit
+                    if best[1] == 1.0:
+                        return best
+        return best
+
+    def _best_for(self, compact: str, words: tuple):
+        grams = _trigrams(compact)
+        shared = {}
+        for gram in grams:
+            for alias_id in self._index.get(gram, ()):
+                shared[alias_id] = shared.get(alias_id, 0) + 1
+        scored = []
+        for alias_id, n in shared.items():
+            dice = 2.0 * n / (len(grams) + self._aliases[alias_id][2])
+            if dice >= self.prefilter:
+                scored.append((-dice, alias_id))
+        scored.sort()
+
+        best = None
+        for _, alias_id in scored[:self.max_candidates]:
+            alias, target, _, target_words = self._aliases[alias_id]
+            longest = max(len(compact), len(target))
+            max_dist = int(longest * (1 - self.threshold))
+            dist = bounded_levenshtein(compact, target, max_dist)
+            if dist > max_dist or (dist and not self._words_agree(words, target_words)):
+                continue
+            similarity = 1.0 - dist / longest
+            # ties keep the earlier alias (CSV order), like RiskMatcher
+            if best is None or similarity > best[1] or (similarity == best[1] and alias_id < best[2]):
+                best = (alias, similarity, alias_id)
+        return best[:2] if best else None
+
+    def _words_agree(self, words: tuple, target_words: tuple) -> bool:
+        # words merged or split by OCR on top of a misspelling: too far to call
+        if len(words) != len(target_words):
+            return False
+        for word, target in zip(words, target_words):
+            if word == target:
+                continue
+            # one substituted word (citrate/nitrate, iodate/bromate) is another ingredient
+            if word[0] != target[0]:
+                return False
+            budget = int(max(len(word), len(target)) * (1 - self.threshold))
+            if bounded_levenshtein(word, target, budget) > budget:
+                return False
+        return True
+
+    def match(self, token_norm: str):
+        """Return ((category, risk, concern), similarity); UNKNOWN with 0.0 when nothing is close."""
+        hit = self.best(token_norm)
+        if hit is None:
+            return UNKNOWN, 0.0
+        alias, similarity = hit
+        return self.alias_map[alias], round(similarity, 3)
@@ -0,0 +1,113 @@
+"""
+Vectorized per-serving nutrition and %DV across many products.
+
+nutrient_matrix() turns N products' nutriments into a dense products x
+nutrients frame (NaN where missing) normalized to one base unit per
+dimension (grams for mass, kcal for energy); pct_dv_matrix() then divides
+by the daily values in a single broadcast step.
+"""
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from engine import DV_KEY_MAP, MACRO_KEYS, MICRO_KEYS
+
+NUTRIENT_KEYS = {**MACRO_KEYS, **MICRO_KEYS}
+
+# unit -> (dimension, factor to the dimension's base unit)
+UNIT_FACTORS = {
+    "g": ("mass", 1.0),
+    "mg": ("mass", 1e-3),
+    "µg": ("mass", 1e-6),
+    "μg": ("mass", 1e-6),  # greek mu, as typed by some contributors
+    "mcg": ("mass", 1e-6),
+    "ug": ("mass", 1e-6),
+    "kg": ("mass", 1e3),
+    "kcal": ("energy", 1.0),
+    "kj": ("energy", 1 / 4.184),
+}
+_FACTOR = {u: f for u, (_, f) in UNIT_FACTORS.items()}
+_DIMENSION = {u: d for u, (d, _) in UNIT_FACTORS.items()}
+
+
+def dv_name_candidates(key: str) -> List[str]:
+    """DV names that may hold the daily value for an OFF nutrient key, most specific first."""
+    names = []
+    if key in DV_KEY_MAP:
+        names.append(DV_KEY_MAP[key])
+    names.append(key.replace("-", " "))
+    if key in NUTRIENT_KEYS:
+        label = NUTRIENT_KEYS[key][0].lower()
+        names.append(label)
+        # "vitamin b1 (thiamin)" -> also try "thiamin"
+        if "(" in label:
+            names.append(label.split("(", 1)[1].rstrip(")").strip())
+    return names
+
+
+def _nutriments_of(product: dict) -> dict:
+    # accept either reconcile() products or bare nutriments dicts
+    if "nutriments" in product or "product_name" in product:
+        return product.get("nutriments") or {}
+    return product
+
+
+def nutrient_matrix(products: Iterable[dict], keys: Dict[str, Tuple[str, str]] = None,
+                    index: Iterable = None) -> pd.DataFrame:
+    """
+    Dense products x nutrients frame of per-serving values in base units
+    (g for mass nutrients, kcal for energy). Missing values and values in
+    unknown units are NaN.
+    """
+    keys = keys or NUTRIENT_KEYS
+    cols = list(keys)
+    nutriments = [_nutriments_of(p) for p in products]
+    n, k = len(nutriments), len(cols)
+
+    frame = pd.DataFrame.from_records(
+        nutriments, columns=[f"{c}_serving" for c in cols] + [f"{c}_unit" for c in cols])
+    values = frame.iloc[:, :k].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    units = frame.iloc[:, k:].to_numpy(dtype=object, copy=True)
+    # fall back to each nutrient's default unit
+    missing = pd.isna(units)
+    units[missing] = np.broadcast_to(np.array([keys[c][1] for c in cols], dtype=object), (n, k))[missing]
+    # only a handful of distinct unit strings: resolve those, then gather a factor for every cell
+    codes, uniques = pd.factorize(units.ravel())
+    lookup = np.array([_FACTOR.get(str(u).lower(), np.nan) for u in uniques], dtype=float)
+    factors = lookup[codes].reshape(n, k)
+    return pd.DataFrame(values * factors, columns=cols, index=list(index) if index is not None else None)
+
+
+def dv_vector(daily_values: dict, keys: Iterable[str]) -> pd.Series:
+    """Daily value per nutrient key in base units (NaN where the DV table has no entry)."""
+    out = {}
+    for key in keys:
+        out[key] = np.nan
+        dimension = _DIMENSION.get(NUTRIENT_KEYS.get(key, ("", ""))[1])
+        for name in dv_name_candidates(key):
+            if name in daily_values:
+                dv_val, dv_unit = daily_values[name]
+                unit = (dv_unit or "").lower()
+                # only compare like with like (no kcal vs grams)
+                if unit in _FACTOR and (dimension is None or _DIMENSION[unit] == dimension):
+                    out[key] = dv_val * _FACTOR[unit]
+                break
+    return pd.Series(out, dtype=float)
+
+
+def pct_dv_matrix(matrix: pd.DataFrame, daily_values: dict) -> pd.DataFrame:
+    """%DV for every nutrient that has a daily value, computed in one vectorized step."""
+    dv = dv_vector(daily_values, matrix.columns)
+    dv = dv[dv > 0]
+    return matrix[dv.index].div(dv, axis=1) * 100.0
+
+
+def display_matrix(matrix: pd.DataFrame, keys: Dict[str, Tuple[str, str]] = None) -> pd.DataFrame:
+    """Convert base-unit columns back to each nutrient's display unit, labelled like the tiles."""
+    keys = keys or NUTRIENT_KEYS
+    cols = [c for c in matrix.columns if c in keys]
+    factors = np.array([_FACTOR.get(keys[c][1].lower(), 1.0) for c in cols])
+    out = matrix[cols] / factors
+    out.columns = [f"{keys[c][0]} ({keys[c][1]})" for c in cols]
+    return out
@@ -0,0 +1,178 @@
+"""
+Offline OpenFoodFacts index built from a bulk export.
+
+    python off_index.py openfoodfacts-products.jsonl.gz off_index.sqlite3
+    python off_index.py en.openfoodfacts.org.products.csv.gz off_index.sqlite3
+
+The dump is streamed line by line (gzip or plain, JSONL or the tab-separated
+CSV export) and only the fields reconcile() uses are kept, one compact JSON
+row per GTIN in a SQLite table keyed by code. Per-serving nutriments missing
+from the dump are derived from the per-100g values and serving_quantity.
+"""
+import argparse
+import csv
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from source import product_from_off
+
+CSV_FIELDS = ["product_name", "brands", "ingredients_text", "serving_size", "serving_quantity",
+              "image_url", "image_front_url", "image_nutrition_url"]
+NUTRIMENT_SUFFIXES = ("_100g", "_serving", "_unit")
+# OFF stores *_100g in grams, except energy
+_100G_UNITS = {"energy-kcal": "kcal", "energy-kj": "kJ", "energy": "kJ"}
+
+
+def _open_text(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace", newline="")
+    return open(path, "r", encoding="utf-8", errors="replace", newline="")
+
+
+def _is_csv(path):
+    name = path[:-3] if path.endswith(".gz") else path
+    return name.endswith((".csv", ".tsv"))
+
+
+def add_serving_values(prod: dict) -> dict:
+    """
+    Fill in missing *_serving nutriments from *_100g and serving_quantity (grams).
+
+    The CSV export only has per-100g columns and many JSONL products lack
+    per-serving values, while the dashboard shows nutrients per serving.
+    """
+    nut = prod.get("nutriments")
+    try:
+        grams = float(prod.get("serving_quantity") or 0)
+    except (TypeError, ValueError):
+        return prod
+    if not nut or grams <= 0:
+        return prod
+    for name, value in list(nut.items()):
+        if not name.endswith("_100g") or not isinstance(value, (int, float)):
+            continue
+        base = name[:-len("_100g")]
+        if f"{base}_serving" not in nut:
+            nut[f"{base}_serving"] = value * grams / 100
+            nut.setdefault(f"{base}_unit", _100G_UNITS.get(base, "g"))
+    return prod
+
+
+def iter_jsonl(path):
+    """Yield (code, off_product) from a JSONL dump, skipping broken lines."""
+    with _open_text(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                prod = json.loads(line)
+            except ValueError:
+                continue
+            code = str(prod.get("code") or prod.get("_id") or "").strip()
+            if code:
+                yield code, add_serving_values(prod)
+
+
+def iter_csv(path):
+    """Yield (code, off_product) from the OFF CSV export (tab-separated, per-100g nutriment columns)."""
+    csv.field_size_limit(sys.maxsize)
+    with _open_text(path) as f:
+        reader = csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE)
+        header = next(reader, None)
+        if not header:
+            return
+        index = {name: i for i, name in enumerate(header)}
+        code_i = index.get("code")
+        if code_i is None:
+            raise ValueError(f"{path}: no 'code' column")
+        fields = [(name, index[name]) for name in CSV_FIELDS if name in index]
+        nutriments = [(name, i) for name, i in index.items() if name.endswith(NUTRIMENT_SUFFIXES)]
+        for row in reader:
+            if len(row) <= code_i or not row[code_i].strip():
+                continue
+            prod = {name: row[i] for name, i in fields if i < len(row) and row[i]}
+            # the CSV export has no front image column; image_url is the front image
+            prod.setdefault("image_front_url", prod.get("image_url"))
+            nut = {}
+            for name, i in nutriments:
+                if i < len(row) and row[i]:
+                    try:
+                        nut[name] = float(row[i])
+                    except ValueError:
+                        nut[name] = row[i]
+            prod["nutriments"] = nut
+            yield row[code_i].strip(), add_serving_values(prod)
+
+
+def build_index(dump_path: str, db_path: str, batch_size: int = 5000) -> int:
+    """Stream dump_path into a fresh SQLite index at db_path. Returns the number of products stored."""
+    tmp_path = db_path + ".building"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("CREATE TABLE products (code TEXT PRIMARY KEY, product TEXT NOT NULL) WITHOUT ROWID")
+
+    rows = iter_csv(dump_path) if _is_csv(dump_path) else iter_jsonl(dump_path)
+    batch = []
+    count = 0
+    for code, prod in rows:
+        product = product_from_off(prod)
+        if product is None:
+            continue
+        batch.append((code, json.dumps(product, separators=(",", ":"), ensure_ascii=False)))
+        if len(batch) >= batch_size:
+            conn.executemany("INSERT OR REPLACE INTO products VALUES (?, ?)", batch)
+            count += len(batch)
+            batch.clear()
+    if batch:
+        conn.executemany("INSERT OR REPLACE INTO products VALUES (?, ?)", batch)
+        count += len(batch)
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, db_path)
+    return count
+
+
+class LocalIndex:
+    """Read-only lookups against an index produced by build_index()."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def get(self, gtin: str):
+        """Return the stored product, or None if the GTIN is not in the dump."""
+        with self._lock:
+            row = self._conn.execute("SELECT product FROM products WHERE code = ?", (gtin,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("dump", help="OpenFoodFacts JSONL or CSV export (optionally .gz)")
+    ap.add_argument("db", nargs="?", default="off_index.sqlite3", help="output index (default: off_index.sqlite3)")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    count = build_index(args.dump, args.db)
+    print(f"indexed {count} products into {args.db} in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Pure HTML builders for the dashboard (no Streamlit imports), so the markup
+can be cached, benchmarked and reused outside the app.
+
+build_dashboard() turns an Analysis into a Dashboard of finished fragments;
+RenderCache keeps those per (GTIN, risk-list version, daily-values version)
+so a rerun for the same product only re-emits strings.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import pandas as pd
+
+from engine import RISK_COLORS, Analysis, IngredientMatch, Nutrient
+from tracing import traced
+
+PILLS_CSS = """
+.pills { display:flex; flex-wrap:wrap; gap:10px; }
+.pill {
+  display:inline-flex; align-items:center; gap:6px;
+  padding:8px 12px; border-radius:9999px; border:1px solid transparent;
+  font-size:0.95rem; font-weight:600; white-space:nowrap;
+}
+.legend { display:inline-flex; align-items:center; gap:26px; }
+.legend-item { display: inline-flex; align-items:center; gap:6px; }
+.legend-dot {
+  width:14px; height:14px; border-radius:9999px; border:1px solid #e5e7eb;
+}
+""" + "".join(
+    f'.pill[data-risk="{risk}"] {{ background:{c["bg"]}; border-color:{c["border"]}; color:{c["text"]}; }}\n'
+    for risk, c in RISK_COLORS.items()
+)
+
+TILES_CSS = """
+.section-title { font-weight:700; font-size:1.05rem; margin: 0.75rem 0 0.5rem 0; }
+
+.serving-banner {
+  display:flex; align-items:center; justify-content:center;
+  padding:10px 14px; border-radius:12px; border:1px solid #C8E6C9;
+  background:#E8F5E9; color:#1B5E20; font-weight:700;
+  box-shadow: 0 1px 3px rgba(0,0,0,0.05);
+}
+
+.tiles {
+  display: grid;
+  grid-template-columns: repeat(auto-fit, minmax(150px, 1fr));
+  gap: 12px;
+}
+
+.tile {
+  border-radius: 14px;
+  padding: 12px;
+  background: #ffffff;
+  border: 1px solid #e5e7eb;
+  box-shadow: 0 1px 3px rgba(0,0,0,0.04);
+}
+.tile-label { color:#374151; font-size:0.9rem; margin-bottom:6px; font-weight:600; }
+.tile-value { font-size:1.15rem; font-weight:800; color:#111827; }
+
+.tile-macro {
+  background: #F0F9FF;           /* light blue */
+  border-color: #93C5FD;         /* blue border */
+}
+.tile-micro {
+  background: #FFF7ED;           /* light orange/peach */
+  border-color: #FDBA74;         /* orange border */
+}
+"""
+
+# one <style> block for the whole dashboard, built once at import
+DASHBOARD_CSS = f"<style>{PILLS_CSS}{TILES_CSS}</style>"
+
+
+def pills_html(ingredients: Iterable[IngredientMatch]) -> str:
+    pills = []
+    for item in ingredients:
+        title = f"Category: {item.category} • Concern: {item.concern}"
+        if 0 < item.confidence < 1:
+            title += f" • Fuzzy match: {item.confidence:.0%}"
+        pills.append(f"<span class='pill' data-risk='{item.risk}' title='{title}'>{item.display}</span>")
+    return "<div class='pills'>" + "".join(pills) + "</div><br>"
+
+
+def tile_html(n: Nutrient) -> str:
+    klass = "tile-macro" if n.kind == "macro" else "tile-micro"
+    value_s = "-" if n.value is None else n.value
+    unit_s = f" {n.unit}" if n.unit and n.value is not None else ""
+    dv_txt = f" ({round(n.pct_dv):d}% DV)" if n.pct_dv is not None else ""
+
+    return f"""<div class="tile {klass}">
+        <div class="tile-label">{n.label}</div>
+        <div class="tile-value">{value_s}{unit_s}{dv_txt}</div>
+    </div>"""
+
+
+def tiles_html(nutrients: Iterable[Nutrient], empty: str) -> str:
+    tiles = [tile_html(n) for n in nutrients]
+    return f"<div class='tiles'>{''.join(tiles) if tiles else f'<em>{empty}</em>'}</div>"
+
+
+def highlight_risk(val):
+    c = RISK_COLORS.get(val)
+    if c is None or val == "Unknown":
+        return ""
+    return f"background-color: {c['bg']}; color: {c['text']}; font-weight:600;"
+
+
+def summary_table(ingredients: Iterable[IngredientMatch]) -> Optional[pd.DataFrame]:
+    """Table of risk-list ingredients, or None when there are none; see style_summary."""
+    ingredients = list(ingredients)
+    rows = [
+        {"Ingredient": item.display, "Category": item.category, "Concern": item.concern, "Risk": item.risk}
+        for item in ingredients
+    ]
+    if not rows:
+        return None
+    df = pd.DataFrame(rows)
+    # only fuzzy matches are uncertain; show how close they were
+    if any(item.confidence < 1 for item in ingredients):
+        df["Match"] = [item.confidence for item in ingredients]
+    return df
+
+
+def style_summary(df: pd.DataFrame):
+    """
+    Risk-coloured Styler for a summary_table. Build one per render: a
+    Styler is mutated when it renders, so it must not be cached or shared
+    between sessions.
+    """
+    styler = df.style.map(highlight_risk, subset=["Risk"])
+    if "Match" in df.columns:
+        styler = styler.format({"Match": "{:.0%}"})
+    return styler
+
+
+@dataclass(frozen=True)
+class Dashboard:
+    """Finished fragments for one product; main.py only has to emit them."""
+    title: str
+    # image URLs; main.py fetches the thumbnails after the text is on screen
+    front_image_url: Optional[str]
+    nutri_image_url: Optional[str]
+    pills: str
+    summary: Optional[pd.DataFrame]  # plain data; style it per render with style_summary
+    serving: str
+    macros: str
+    micros: str
+
+
+@traced("render.build")
+def build_dashboard(analysis: Analysis) -> Dashboard:
+    brand, product = analysis.brand, analysis.product_name
+    title = f"<h3 style='text-align: center;'>✨ {brand or ''} {product or ''} ✨</h3>" if brand or product else ""
+    pills = pills_html(analysis.ingredients)
+    summary = summary_table(analysis.risky)
+    macros = tiles_html(analysis.macros, "No macro data")
+    micros = tiles_html(analysis.micros, "No micro data")
+    return Dashboard(
+        title=title,
+        front_image_url=analysis.image_front_url,
+        nutri_image_url=analysis.image_nutri_url,
+        pills=pills,
+        summary=summary,
+        serving=f"<div class='serving-banner'>{analysis.serving_size or '-'}</div>",
+        macros=macros,
+        micros=micros,
+    )
+
+
+class RenderCache:
+    """
+    Thread-safe LRU of Dashboards. Keys should include the table versions so
+    an edited risk list or DV table never serves old markup; the TTL lets
+    refreshed OpenFoodFacts data show up without a restart.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (built_at, dashboard)
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key) -> Optional[Dashboard]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl:
+                self._entries.pop(key, None)
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def put(self, key, dashboard: Dashboard):
+        with self._lock:
+            self._entries[key] = (time.time(), dashboard)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, size=len(self._entries))
@@ -1,30 +1,167 @@
+import io
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import NamedTuple
+
 import requests
-from PIL import Image
-from pyzbar.pyzbar import decode as zbar_decode
+from requests.adapters import HTTPAdapter
+from PIL import Image, ImageOps
+from pyzbar.pyzbar import ZBarSymbol, decode as zbar_decode
+import gtin as gtins
+from cache import ProductCache
+from decode_cache import DecodeCache
+from singleflight import SingleFlight
+from tracing import span, traced
+
+PRODUCT_CACHE_PATH = os.environ.get("BITERIGHT_PRODUCT_CACHE", "product_cache.sqlite3")
+PRODUCT_CACHE_TTL = float(os.environ.get("BITERIGHT_PRODUCT_TTL", 7 * 24 * 3600))
+PRODUCT_CACHE_NEGATIVE_TTL = float(os.environ.get("BITERIGHT_PRODUCT_NEGATIVE_TTL", 6 * 3600))
+PRODUCT_CACHE_STALE_TTL = float(os.environ.get("BITERIGHT_PRODUCT_STALE_TTL", 30 * 24 * 3600))
+PRODUCT_CACHE_MAX_ENTRIES = int(os.environ.get("BITERIGHT_PRODUCT_CACHE_SIZE", 5000))
+
+OFF_BASE_URL = os.environ.get("BITERIGHT_OFF_URL", "https://world.openfoodfacts.org")
+OFF_FIELDS = [
+    "product_name", "brands",
+    "image_url", "image_front_url", "image_nutrition_url",
+    "ingredients_text", "nutriments", "serving_size"]
+OFF_INDEX_PATH = os.environ.get("BITERIGHT_OFF_INDEX", "off_index.sqlite3")
+DECODE_CACHE_SIZE = int(os.environ.get("BITERIGHT_DECODE_CACHE_SIZE", 512))
+USER_AGENT = "BiteRight/1.0 (+https://biteright-app.streamlit.app)"
+
+
+# zbar's default EAN family (UPC-A is reported as EAN-13); restricting the
+# scanners to these skips QR/Code128/etc. work on every pass
+BARCODE_SYMBOLS = [ZBarSymbol.EAN13, ZBarSymbol.EAN8, ZBarSymbol.UPCE]
+PREFERRED_SYMBOLS = {"EAN13", "EAN8", "UPCA", "UPCE"}
+FIRST_PASS_MAX_SIDE = 1024
+ROTATIONS = (30, -30, 45, -45)
+
+
+class Barcode(NamedTuple):
+    data: str
+    symbology: str
+
+
+def _read_image_source(image):
+    """Bytes, a path, a file-like object or a PIL image -> something Image.open can reopen."""
+    if isinstance(image, Image.Image):
+        return image
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return bytes(image)
+    if isinstance(image, (str, os.PathLike)):
+        return image
+    # file-like (e.g. a Streamlit UploadedFile); read once so later passes can reopen
+    if hasattr(image, "getvalue"):
+        return image.getvalue()
+    if hasattr(image, "seek"):
+        image.seek(0)
+    return image.read()
+
+
+def _open(source, draft_size=None):
+    if isinstance(source, Image.Image):
+        img = source
+    else:
+        img = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+        if draft_size:
+            # JPEG: let the decoder downscale by 1/2..1/8 instead of decoding all pixels
+            img.draft("L", (draft_size, draft_size))
+    return img.convert("L")
 
-def decode_barcode_from_image(image_path: str):
-    img = Image.open(image_path)
-    codes = zbar_decode(img)
-    preferred = {"EAN13", "EAN8", "UPCA", "UPCE"}
+
+def locate_barcode(img):
+    """(Barcode, rect) for the first EAN/UPC zbar finds in img, rect being (left, top, width, height); else (None, None)."""
+    with span("zbar"):
+        codes = zbar_decode(img, symbols=BARCODE_SYMBOLS)
     for c in codes:
-        if c.type in preferred:
-            return c.data.decode("utf-8").strip()
+        if c.type in PREFERRED_SYMBOLS:
+            data = c.data.decode("utf-8").strip()
+            return Barcode(gtins.normalize_decoded(data, c.type), c.type), tuple(c.rect)
+    return None, None
+
+
+def _zbar(img):
+    return locate_barcode(img)[0]
+
+
+def _decode_passes(source):
+    """Yield progressively more expensive grayscale views of the image."""
+    small = _open(source, FIRST_PASS_MAX_SIDE)
+    if max(small.size) > FIRST_PASS_MAX_SIDE:
+        small.thumbnail((FIRST_PASS_MAX_SIDE, FIRST_PASS_MAX_SIDE), Image.BILINEAR)
+    yield small
+    yield ImageOps.autocontrast(small, cutoff=1)
+
+    full = _open(source)
+    if max(full.size) > max(small.size):
+        yield full
+    # barcode usually sits mid-frame: zoom into the centre at full resolution
+    w, h = full.size
+    for frac in (0.5, 0.75):
+        dx, dy = int(w * (1 - frac) / 2), int(h * (1 - frac) / 2)
+        yield full.crop((dx, dy, w - dx, h - dy))
+    # zbar scans rows and columns, so only oblique angles need help
+    for angle in ROTATIONS:
+        yield small.rotate(angle, resample=Image.BILINEAR, expand=True, fillcolor=255)
+
+
+@traced("decode_barcode")
+def decode_barcode(image):
+    """
+    Decode the first EAN/UPC barcode from image bytes, a path, a file-like
+    object or a PIL image. Cheap passes run first; higher resolution, centre
+    crops and rotations are only tried when they fail.
+    """
+    source = _read_image_source(image)
+    for view in _decode_passes(source):
+        found = _zbar(view)
+        if found:
+            return found
     return None
 
-def openfoodfacts_by_gtin(gtin: str):
 
-    url = f"https://world.openfoodfacts.org/api/v3/product/{gtin}"
-    r = requests.get(url, params={"fields": ",".join([
-        "product_name","brands",
-        "image_url","image_front_url","image_nutrition_url",
-        "ingredients_text","nutriments","serving_size"])}, timeout=12)
+def decode_barcode_cached(image):
+    """decode_barcode, through the decode cache when image is (or reads as) bytes."""
+    source = _read_image_source(image)
+    cache = get_decode_cache()
+    if cache and isinstance(source, bytes):
+        return cache.get_or_decode(source, decode_barcode)
+    return decode_barcode(source)
 
-    if r.status_code != 200:
-        return None
-    j = r.json()
-    if j.get("status") != "success" or "product" not in j:
-        return None
-    prod = j["product"]
+
+def decode_barcode_from_image(image):
+    found = decode_barcode_cached(image)
+    return found.data if found else None
+
+
+_decode_cache = None
+_decode_cache_lock = threading.Lock()
+
+
+def get_decode_cache() -> DecodeCache:
+    global _decode_cache
+    with _decode_cache_lock:
+        if _decode_cache is None:
+            _decode_cache = DecodeCache(DECODE_CACHE_SIZE)
+    return _decode_cache
+
+
+def set_decode_cache(cache):
+    """Swap the process-wide decode cache (None disables caching)."""
+    global _decode_cache
+    _decode_cache = cache if cache is not None else False
+
+
+class UpstreamError(Exception):
+    """OpenFoodFacts kept failing (timeouts, 5xx, bad payloads) within the request deadline."""
+
+
+def product_from_off(prod: dict):
+    """Project an OpenFoodFacts product object onto the fields the app uses."""
     if not prod:
         return None
     name = (prod.get("product_name") or "").strip()
@@ -46,6 +183,279 @@ def openfoodfacts_by_gtin(gtin: str):
         "serving_size": serving_size or None,
     }
 
-def reconcile(gtin: str) -> dict:
-    chosen = openfoodfacts_by_gtin(gtin)
+
+class RateLimiter:
+    """Thread-safe token bucket: on average at most `rate` acquisitions per second, bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            # reserve a token even if it is not there yet; callers queue up in order
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+class OpenFoodFactsClient:
+    """
+    Reusable OpenFoodFacts client.
+
+    Keeps a keep-alive connection pool, retries timeouts / 429 / 5xx with
+    jittered exponential backoff inside a per-request deadline, and
+    revalidates products it has already seen with ETag / Last-Modified.
+    An optional RateLimiter is consulted before every outgoing request.
+    fetch() returns None only when OFF says the product does not exist;
+    anything else that fails raises UpstreamError.
+    """
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, base_url: str = OFF_BASE_URL, timeout: float = 12, deadline: float = 20,
+                 retries: int = 3, backoff: float = 0.25, max_backoff: float = 4,
+                 pool_size: int = 10, validators_size: int = 1024, rate_limiter: RateLimiter = None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.rate_limiter = rate_limiter
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # gtin -> (etag, last_modified, product) for conditional requests
+        self._validators = OrderedDict()
+        self._validators_size = validators_size
+        self._lock = threading.Lock()
+
+    def fetch(self, gtin: str):
+        url = f"{self.base_url}/api/v3/product/{gtin}"
+        params = {"fields": ",".join(OFF_FIELDS)}
+        stop_at = time.monotonic() + self.deadline
+        last_error = None
+
+        for attempt in range(self.retries + 1):
+            remaining = stop_at - time.monotonic()
+            if remaining <= 0:
+                break
+            with self._lock:
+                known = self._validators.get(gtin)
+            headers = {}
+            if known:
+                etag, last_modified, _ = known
+                if etag:
+                    headers["If-None-Match"] = etag
+                if last_modified:
+                    headers["If-Modified-Since"] = last_modified
+
+            retry_after = None
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                r = self.session.get(url, params=params, headers=headers,
+                                     timeout=min(self.timeout, remaining))
+            except requests.RequestException as e:
+                # connection resets, timeouts, truncated bodies (ChunkedEncodingError), ...
+                last_error = e
+            else:
+                if r.status_code == 304 and known:
+                    return known[2]
+                if r.status_code == 404:
+                    # v3 answers unknown products with 404 + {"status": "failure"}
+                    return None
+                if r.status_code in self.RETRY_STATUSES:
+                    last_error = UpstreamError(f"OpenFoodFacts returned HTTP {r.status_code}")
+                    retry_after = _retry_after_seconds(r.headers.get("Retry-After"))
+                elif r.status_code != 200:
+                    raise UpstreamError(f"OpenFoodFacts returned HTTP {r.status_code}")
+                else:
+                    return self._parse(gtin, r)
+
+            if attempt == self.retries:
+                break
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            if time.monotonic() + delay >= stop_at:
+                break
+            time.sleep(delay)
+
+        raise UpstreamError(f"OpenFoodFacts lookup for {gtin} failed: {last_error}")
+
+    def _parse(self, gtin, r):
+        try:
+            j = r.json()
+        except ValueError as e:
+            raise UpstreamError(f"OpenFoodFacts returned invalid JSON: {e}")
+        if j.get("status") != "success" or "product" not in j:
+            return None
+        product = product_from_off(j["product"])
+        etag = r.headers.get("ETag")
+        last_modified = r.headers.get("Last-Modified")
+        if product is not None and (etag or last_modified):
+            with self._lock:
+                self._validators[gtin] = (etag, last_modified, product)
+                self._validators.move_to_end(gtin)
+                while len(self._validators) > self._validators_size:
+                    self._validators.popitem(last=False)
+        return product
+
+    def close(self):
+        self.session.close()
+
+
+def _retry_after_seconds(value):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> OpenFoodFactsClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OpenFoodFactsClient()
+    return _client
+
+
+def set_client(client: OpenFoodFactsClient):
+    """Swap the process-wide OpenFoodFacts client (e.g. one with a bigger pool or a rate limiter)."""
+    global _client
+    with _client_lock:
+        _client = client
+
+
+@traced("openfoodfacts_by_gtin")
+def openfoodfacts_by_gtin(gtin: str):
+    return get_client().fetch(gtin)
+
+
+# concurrent lookups of the same GTIN (e.g. many sessions scanning a popular
+# product) share one upstream request
+upstream_flights = SingleFlight()
+
+
+def fetch_coalesced(gtin: str):
+    return upstream_flights.do(gtin, openfoodfacts_by_gtin, gtin)
+
+
+_product_cache = None
+_product_cache_lock = threading.Lock()
+
+
+def get_product_cache() -> ProductCache:
+    global _product_cache
+    with _product_cache_lock:
+        if _product_cache is None:
+            _product_cache = ProductCache(
+                PRODUCT_CACHE_PATH,
+                ttl=PRODUCT_CACHE_TTL,
+                negative_ttl=PRODUCT_CACHE_NEGATIVE_TTL,
+                stale_ttl=PRODUCT_CACHE_STALE_TTL,
+                max_entries=PRODUCT_CACHE_MAX_ENTRIES,
+            )
+    return _product_cache
+
+
+def set_product_cache(cache):
+    """Swap the process-wide product cache (None disables caching)."""
+    global _product_cache
+    _product_cache = cache if cache is not None else False
+
+
+_local_index = None
+_local_index_lock = threading.Lock()
+
+
+def get_local_index():
+    """The offline OFF index (see off_index.py), or None when no index file is present."""
+    global _local_index
+    with _local_index_lock:
+        if _local_index is None:
+            _local_index = False
+            if os.path.exists(OFF_INDEX_PATH):
+                from off_index import LocalIndex
+                _local_index = LocalIndex(OFF_INDEX_PATH)
+    return _local_index or None
+
+
+def lookup(gtin: str):
+    """One exact key: offline index, then the product cache / OpenFoodFacts."""
+    index = get_local_index()
+    if index is not None:
+        chosen = index.get(gtin)
+        if chosen is not None:
+            return chosen
+    cache = get_product_cache()
+    if not cache:
+        return fetch_coalesced(gtin)
+    chosen = cache.get_or_fetch(gtin, fetch_coalesced)
     return chosen
+
+
+def lookup_key(key: str):
+    """A canonical key, then its other spellings (UPC-A without the leading 0) only on a miss."""
+    error = None
+    for k in [key] + gtins.fallbacks(key):
+        try:
+            chosen = lookup(k)
+        except UpstreamError as e:
+            error = error or e
+            continue
+        if chosen is not None:
+            return chosen
+    # a spelling that errored might have been the hit, so "not found" would be a guess
+    if error is not None:
+        raise error
+    return None
+
+
+@traced("reconcile")
+def reconcile(gtin: str) -> dict:
+    """
+    Look a barcode up. Input is validated first (InvalidGTIN is raised before
+    any network call). Only input with several valid readings (8 digits that
+    are both an EAN-8 and a UPC-E) fans out: every reading is looked up on
+    threads of this call and the first hit wins (the more likely reading when
+    several land together).
+    """
+    variants = gtins.candidates(gtin)
+    if len(variants) == 1:
+        return lookup_key(variants[0])
+
+    pool = ThreadPoolExecutor(max_workers=len(variants), thread_name_prefix="gtin-variant")
+    try:
+        rank = {pool.submit(lookup_key, v): i for i, v in enumerate(variants)}
+        pending, error = set(rank), None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in sorted(done, key=rank.get):
+                try:
+                    chosen = fut.result()
+                except UpstreamError as e:
+                    error = e
+                    continue
+                if chosen is not None:
+                    return chosen
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    if error is not None:
+        raise error
+    return None
@@ -0,0 +1,306 @@
+"""
+Continuous barcode scanning over a stream of frames.
+
+    python stream_scan.py 0                  # webcam 0 (OpenCV)
+    python stream_scan.py clip.mp4           # video file (OpenCV)
+    python stream_scan.py frames/            # directory of still images, in name order
+    python stream_scan.py burst.gif          # multi-frame GIF / TIFF / WebP
+
+StreamScanner decodes only every `stride`-th frame, downscaled, and looks
+first inside the region where the last barcode was found (zbar is much
+faster on a small crop). A GTIN is reported once it has been read from k
+decoded frames in a row, so one misread frame cannot open the wrong
+product. A source that ends before that reports the code read most often,
+so a short clip that shows the code once still scans, and nothing when
+the reads disagree without a clear winner. Live sources drop frames that
+arrive while a decode is running, so the scanner always works on the newest
+frame.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Iterable, NamedTuple, Optional
+
+import numpy as np
+from PIL import Image, ImageSequence, UnidentifiedImageError
+
+from source import Barcode, locate_barcode
+from tracing import span
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".tif", ".tiff", ".webp")
+STREAM_MAX_SIDE = 800
+
+
+class ScanResult(NamedTuple):
+    barcode: Optional[Barcode]
+    frames: int      # frames taken from the source
+    decoded: int     # frames actually run through zbar
+    seconds: float
+
+
+def to_gray(frame) -> Image.Image:
+    """PIL image, or numpy array (2-D gray or H x W x 3 RGB), as an 8-bit grayscale PIL image."""
+    if isinstance(frame, Image.Image):
+        return frame if frame.mode == "L" else frame.convert("L")
+    arr = np.asarray(frame)
+    if arr.ndim == 3:
+        arr = arr[..., :3] @ np.array([0.299, 0.587, 0.114])
+    return Image.fromarray(arr.astype(np.uint8, copy=False), "L")
+
+
+def _fit(img, max_side):
+    """img scaled down to max_side (never up), and the scale that was applied."""
+    side = max(img.size)
+    if side <= max_side:
+        return img, 1.0
+    scale = max_side / side
+    return img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.BILINEAR), scale
+
+
+class StreamScanner:
+    """
+    Feed frames one by one; feed() returns the Barcode once it is confirmed.
+
+    k         reads of the same code needed in a row
+    stride    decode every stride-th frame, skip the others
+    max_gap   decoded frames without a read tolerated before the streak and ROI reset
+    """
+
+    def __init__(self, k: int = 3, stride: int = 2, max_side: int = STREAM_MAX_SIDE,
+                 roi_margin: float = 0.6, max_gap: int = 2):
+        self.k = k
+        self.stride = max(1, stride)
+        self.max_side = max_side
+        self.roi_margin = roi_margin
+        self.max_gap = max_gap
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.decoded = 0
+        self.roi_hits = 0
+        self._roi = None        # (left, top, right, bottom) in frame pixels
+        self._candidate = None
+        self._streak = 0
+        self._misses = 0
+        self._reads = Counter()  # GTIN -> decoded frames it was read from
+        self._barcodes = {}      # GTIN -> Barcode
+
+    def feed(self, frame) -> Optional[Barcode]:
+        self.frames += 1
+        if (self.frames - 1) % self.stride:
+            return None
+        self.decoded += 1
+        with span("stream.frame"):
+            found, box = self._detect(to_gray(frame))
+
+        if found is None:
+            self._misses += 1
+            if self._misses > self.max_gap:
+                self._roi, self._candidate, self._streak = None, None, 0
+            return None
+        self._misses = 0
+        self._roi = box
+        self._reads[found.data] += 1
+        self._barcodes[found.data] = found
+        if self._candidate is not None and found.data == self._candidate.data:
+            self._streak += 1
+        else:
+            self._candidate, self._streak = found, 1
+        return found if self._streak >= self.k else None
+
+    def best_read(self) -> Optional[Barcode]:
+        """The code read most often so far, or None if nothing was read or two codes tie."""
+        top = self._reads.most_common(2)
+        if not top or (len(top) == 2 and top[0][1] == top[1][1]):
+            return None
+        return self._barcodes[top[0][0]]
+
+    def _detect(self, gray):
+        if self._roi is not None:
+            found, box = self._detect_in(gray, self._expanded(self._roi, gray.size))
+            if found is not None:
+                self.roi_hits += 1
+                return found, box
+        return self._detect_in(gray, (0, 0, gray.width, gray.height))
+
+    def _expanded(self, roi, size):
+        left, top, right, bottom = roi
+        # grow the last box on every side; the code moves between frames
+        dx = (right - left) * self.roi_margin
+        dy = (bottom - top) * self.roi_margin
+        return (max(0, int(left - dx)), max(0, int(top - dy)),
+                min(size[0], int(right + dx)), min(size[1], int(bottom + dy)))
+
+    def _detect_in(self, gray, area):
+        left, top = area[0], area[1]
+        view = gray if area == (0, 0, gray.width, gray.height) else gray.crop(area)
+        view, scale = _fit(view, self.max_side)
+        found, rect = locate_barcode(view)
+        if found is None:
+            return None, None
+        x, y, w, h = rect
+        box = (left + x / scale, top + y / scale, left + (x + w) / scale, top + (y + h) / scale)
+        return found, box
+
+
+# ---------- frame sources ----------
+
+def _capture(source):
+    try:
+        import cv2
+    except ImportError:
+        raise RuntimeError("video files and webcams need OpenCV: pip install opencv-python-headless") from None
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise OSError(f"cannot open video source {source!r}")
+    return cv2, cap
+
+
+def _video_frames(path):
+    cv2, cap = _capture(path)
+    try:
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                return
+            yield cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    finally:
+        cap.release()
+
+
+def _live_frames(index):
+    """Newest webcam frame each time; frames that arrive while we are decoding are dropped."""
+    cv2, cap = _capture(index)
+    cond = threading.Condition()
+    state = {"frame": None, "seq": 0, "open": True}
+
+    def reader():
+        while state["open"]:
+            ok, frame = cap.read()
+            with cond:
+                if not ok:
+                    state["open"] = False
+                else:
+                    state["frame"], state["seq"] = frame, state["seq"] + 1
+                cond.notify()
+
+    thread = threading.Thread(target=reader, name="camera-reader", daemon=True)
+    thread.start()
+    seen = 0
+    try:
+        while True:
+            with cond:
+                cond.wait_for(lambda: state["seq"] > seen or not state["open"])
+                if state["seq"] == seen:
+                    return
+                frame, seen = state["frame"], state["seq"]
+            yield cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    finally:
+        state["open"] = False
+        thread.join(timeout=1)
+        cap.release()
+
+
+def iter_frames(source) -> Iterable:
+    """
+    Frames from a webcam index (int or digit string), a directory of images,
+    a multi-frame image file or, with OpenCV installed, a video file.
+    """
+    if isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+        yield from _live_frames(int(source))
+        return
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.lower().endswith(IMAGE_EXTS):
+                with Image.open(os.path.join(source, name)) as img:
+                    yield img.convert("L")
+        return
+    try:
+        img = Image.open(source)
+    except UnidentifiedImageError:
+        yield from _video_frames(source)
+        return
+    yield from _image_frames(img)
+
+
+def _image_frames(img):
+    with img:
+        for frame in ImageSequence.Iterator(img):
+            yield frame.convert("L")
+
+
+def scan(frames: Iterable, scanner: StreamScanner = None, timeout: float = None) -> ScanResult:
+    """
+    Run frames through a scanner until a GTIN is confirmed, the frames run out
+    or timeout passes. When the frames run out first, the code read most
+    often is returned (see StreamScanner.best_read): a clip that shows the
+    code in fewer than k frames is better read than not at all.
+    """
+    scanner = scanner or StreamScanner()
+    t0 = time.perf_counter()
+    found = None
+    frames = iter(frames)
+    try:
+        for frame in frames:
+            found = scanner.feed(frame)
+            if found is not None or (timeout is not None and time.perf_counter() - t0 > timeout):
+                break
+        else:
+            found = scanner.best_read()
+    finally:
+        # release cameras / video files as soon as we are done with them
+        close = getattr(frames, "close", None)
+        if close:
+            close()
+    return ScanResult(found, scanner.frames, scanner.decoded, time.perf_counter() - t0)
+
+
+def scan_upload(data: bytes, name: str = "", scanner: StreamScanner = None) -> ScanResult:
+    """Scan an uploaded clip: multi-frame images from memory, videos via a temp file for OpenCV."""
+    try:
+        img = Image.open(io.BytesIO(data))
+    except UnidentifiedImageError:
+        img = None
+    if img is not None:
+        return scan(_image_frames(img), scanner)
+    suffix = os.path.splitext(name)[1] or ".mp4"
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+        f.write(data)
+    try:
+        return scan(iter_frames(f.name), scanner)
+    finally:
+        os.remove(f.name)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Scan a webcam, video file or frame sequence until a barcode is confirmed.")
+    ap.add_argument("source", help="webcam index, video file, directory of images or multi-frame image")
+    ap.add_argument("-k", type=int, default=3, help="consecutive reads needed to confirm (default: 3)")
+    ap.add_argument("--stride", type=int, default=2, help="decode every Nth frame (default: 2)")
+    ap.add_argument("--max-side", type=int, default=STREAM_MAX_SIDE, help="downscale frames to this size")
+    ap.add_argument("--timeout", type=float, default=None, help="give up after this many seconds")
+    args = ap.parse_args(argv)
+
+    scanner = StreamScanner(k=args.k, stride=args.stride, max_side=args.max_side)
+    result = scan(iter_frames(args.source), scanner, timeout=args.timeout)
+    print(json.dumps({
+        "gtin": result.barcode.data if result.barcode else None,
+        "symbology": result.barcode.symbology if result.barcode else None,
+        "frames": result.frames,
+        "decoded": result.decoded,
+        "roi_hits": scanner.roi_hits,
+        "ms": round(result.seconds * 1000, 1),
+    }))
+    if result.barcode is None:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
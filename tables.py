@@ -0,0 +1,286 @@
+"""
+Compiled, hot-reloadable risk and daily-value tables.
+
+    python tables.py                          # compile the CSVs into tables.pkl
+    python tables.py --check                  # validate only, write nothing
+
+compile_tables() parses and validates both CSVs once and writes a versioned
+pickle: a header line with the format, the SHA-256 of the payload, then
+plain dicts, lists and tuples, including the built Aho-Corasick automaton
+so loading never rebuilds the matcher. TableStore loads that artifact at
+startup (recompiling only when a CSV's mtime/size no longer matches what
+was compiled), polls the CSVs from a background thread and swaps in a new
+Tables object atomically when they change. Tables.risk_version / dv_version
+are content hashes of the source files, so downstream caches can key on
+them.
+"""
+import argparse
+import ast
+import csv
+import hashlib
+import logging
+import os
+import pickle
+import sys
+import threading
+import time
+
+from engine import CSV, DV_CSV, RISK_LEVELS, Tables, file_version, parse_intake
+from matcher import RiskMatcher
+from tracing import traced
+
+log = logging.getLogger(__name__)
+
+TABLES_ARTIFACT = os.environ.get("BITERIGHT_TABLES", "tables.pkl")
+TABLES_POLL_INTERVAL = float(os.environ.get("BITERIGHT_TABLES_POLL", 2.0))
+FORMAT = 2
+MAGIC = b"BITERIGHT-TABLES"
+
+
+class TableError(ValueError):
+    """A risk-list or daily-values CSV (or a compiled artifact) failed validation."""
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _read_rows(path, required):
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            missing = [c for c in required if c not in (reader.fieldnames or [])]
+            if missing:
+                raise TableError(f"{path}: missing column(s) {', '.join(missing)}")
+            # header is line 1
+            return list(enumerate(reader, start=2))
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise TableError(f"{path}: {e}") from None
+
+
+def parse_risk_csv(path: str) -> dict:
+    """alias -> (category, risk, concern) from the risk-list CSV; raises TableError listing every bad row."""
+    alias_map, errors = {}, []
+    for line, row in _read_rows(path, ("Category", "Labels", "Risk Level", "Main Concern")):
+        cat = (row["Category"] or "").strip()
+        risk = (row["Risk Level"] or "").strip()
+        concern = (row["Main Concern"] or "").strip()
+        if not cat:
+            errors.append(f"line {line}: empty Category")
+        if risk not in RISK_LEVELS[:-1]:
+            errors.append(f"line {line}: Risk Level must be one of {RISK_LEVELS[:-1]}, got {risk!r}")
+        try:
+            labels = ast.literal_eval(row["Labels"] or "")
+        except (ValueError, SyntaxError):
+            labels = None
+        if not isinstance(labels, (list, tuple)) or not all(isinstance(x, str) for x in labels):
+            errors.append(f"line {line}: Labels must be a list of strings, got {row['Labels']!r}")
+            continue
+        for label in labels:
+            alias = label.strip().lower()
+            if alias:
+                # a repeated alias keeps its first position but takes the later row
+                alias_map[alias] = (cat, risk, concern)
+    if errors:
+        raise TableError(f"{path}:\n  " + "\n  ".join(errors))
+    return alias_map
+
+
+def parse_daily_values_csv(path: str) -> dict:
+    """nutrient -> (value, unit) from the daily-values CSV (e.g. '2000 kcal'); raises TableError on bad rows."""
+    daily_values, errors = {}, []
+    for line, row in _read_rows(path, ("nutrient", "Intake")):
+        name = (row["nutrient"] or "").strip().lower()
+        val, unit = parse_intake(row["Intake"])
+        if not name:
+            errors.append(f"line {line}: empty nutrient")
+        elif val is None or val <= 0:
+            errors.append(f"line {line}: Intake must look like '25 g', got {row['Intake']!r}")
+        else:
+            daily_values[name] = (val, unit)
+    if errors:
+        raise TableError(f"{path}:\n  " + "\n  ".join(errors))
+    return daily_values
+
+
+@traced("tables.compile")
+def compile_tables(risk_csv: str = CSV, dv_csv: str = DV_CSV, out: str = TABLES_ARTIFACT) -> dict:
+    """Validate both CSVs and write the artifact atomically; returns the compiled document."""
+    # stamp before reading: an edit during compilation leaves a mismatch and is picked up next poll
+    sources = {"risk": (risk_csv, _stamp(risk_csv)), "dv": (dv_csv, _stamp(dv_csv))}
+    alias_map = parse_risk_csv(risk_csv)
+    doc = {
+        "format": FORMAT,
+        "compiled_at": time.time(),
+        "sources": sources,
+        "risk_version": file_version(risk_csv),
+        "dv_version": file_version(dv_csv),
+        "alias_map": alias_map,
+        "daily_values": parse_daily_values_csv(dv_csv),
+        "automaton": RiskMatcher(alias_map).state(),
+    }
+    if out:
+        payload = pickle.dumps(doc, protocol=pickle.HIGHEST_PROTOCOL)
+        header = b"%s %d %s\n" % (MAGIC, FORMAT, hashlib.sha256(payload).hexdigest().encode())
+        tmp = f"{out}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(header + payload)
+        os.replace(tmp, out)
+    return doc
+
+
+@traced("tables.load")
+def load_artifact(path: str = TABLES_ARTIFACT) -> dict:
+    """Read and verify a compiled artifact; raises TableError if it is foreign, old or corrupt."""
+    with open(path, "rb") as f:
+        header = f.readline()
+        payload = f.read()
+    parts = header.split()
+    if len(parts) != 3 or parts[0] != MAGIC:
+        raise TableError(f"{path}: not a BiteRight tables artifact")
+    if int(parts[1]) != FORMAT:
+        raise TableError(f"{path}: format {int(parts[1])}, expected {FORMAT}")
+    if hashlib.sha256(payload).hexdigest().encode() != parts[2]:
+        raise TableError(f"{path}: payload hash mismatch")
+    return pickle.loads(payload)
+
+
+def tables_from(doc: dict) -> Tables:
+    matcher = RiskMatcher.from_state(doc["alias_map"], doc["automaton"])
+    return Tables.build(doc["alias_map"], doc["daily_values"],
+                        risk_version=doc["risk_version"], dv_version=doc["dv_version"], matcher=matcher)
+
+
+class TableStore:
+    """
+    Holds the current Tables and swaps in new ones when the CSVs change.
+
+    current() is a plain attribute read, so every caller sees either the old
+    or the new Tables, never a mix. A CSV edit that fails validation is
+    logged and kept in last_error; the previous tables stay live.
+    """
+
+    def __init__(self, risk_csv: str = CSV, dv_csv: str = DV_CSV, artifact: str = TABLES_ARTIFACT,
+                 poll_interval: float = TABLES_POLL_INTERVAL):
+        self.risk_csv = risk_csv
+        self.dv_csv = dv_csv
+        self.artifact = artifact
+        self.poll_interval = poll_interval
+        self.last_error = None
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._sources = None
+        self._failed = None
+        self._tables = self._load()
+
+    def current(self) -> Tables:
+        return self._tables
+
+    @property
+    def version(self) -> str:
+        return self._tables.version
+
+    def _stamps(self):
+        return {"risk": (self.risk_csv, _stamp(self.risk_csv)), "dv": (self.dv_csv, _stamp(self.dv_csv))}
+
+    def _load(self) -> Tables:
+        if self.artifact and os.path.exists(self.artifact):
+            try:
+                doc = load_artifact(self.artifact)
+                if doc["sources"] == self._stamps():
+                    self._sources = doc["sources"]
+                    return tables_from(doc)
+            except (TableError, OSError, pickle.UnpicklingError, KeyError, EOFError) as e:
+                log.warning("ignoring tables artifact: %s", e)
+        doc = compile_tables(self.risk_csv, self.dv_csv, self.artifact)
+        self._sources = doc["sources"]
+        return tables_from(doc)
+
+    def reload(self, force: bool = False) -> bool:
+        """Recompile and swap if the CSVs changed (or force). Returns True when tables were swapped."""
+        with self._lock:
+            try:
+                stamps = self._stamps()
+                # a failed edit is only retried once the files change again
+                if not force and stamps in (self._sources, self._failed):
+                    return False
+                doc = compile_tables(self.risk_csv, self.dv_csv, self.artifact)
+            except (TableError, OSError) as e:
+                self._failed = stamps if isinstance(e, TableError) else None
+                self.last_error = str(e)
+                log.error("tables not reloaded: %s", e)
+                return False
+            self._sources = doc["sources"]
+            self.last_error = None
+            if (doc["risk_version"], doc["dv_version"]) == (self._tables.risk_version, self._tables.dv_version):
+                return False  # touched, not changed
+            self._tables = tables_from(doc)
+            self.reloads += 1
+            log.info("tables reloaded: %s", self._tables.version)
+            return True
+
+    def start(self):
+        """Start polling the CSVs in a daemon thread (idempotent)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._watch, name="table-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                # an unexpected failure must not silently end the watcher
+                self.last_error = f"{type(e).__name__}: {e}"
+                log.exception("tables reload failed")
+
+    def stats(self) -> dict:
+        return {"version": self.version, "reloads": self.reloads, "last_error": self.last_error,
+                "watching": self._thread is not None and self._thread.is_alive()}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_table_store() -> TableStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = TableStore()
+        return _store
+
+
+def set_table_store(store: TableStore):
+    global _store
+    with _store_lock:
+        _store = store
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Compile the risk list and daily values into a tables artifact.")
+    ap.add_argument("--risk-csv", default=CSV)
+    ap.add_argument("--dv-csv", default=DV_CSV)
+    ap.add_argument("-o", "--output", default=TABLES_ARTIFACT, help=f"artifact path (default: {TABLES_ARTIFACT})")
+    ap.add_argument("--check", action="store_true", help="validate the CSVs without writing an artifact")
+    args = ap.parse_args(argv)
+
+    try:
+        doc = compile_tables(args.risk_csv, args.dv_csv, None if args.check else args.output)
+    except TableError as e:
+        sys.exit(str(e))
+    print(f"{len(doc['alias_map'])} aliases, {len(doc['daily_values'])} daily values, "
+          f"version {doc['risk_version']}-{doc['dv_version']}"
+          + ("" if args.check else f" -> {args.output}"), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
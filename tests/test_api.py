@@ -0,0 +1,57 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+pytest.importorskip("pyzbar.pyzbar", exc_type=ImportError)  # needs libzbar
+
+import api  # noqa: E402
+import tables  # noqa: E402
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setattr(tables, "_store", tables.TableStore(artifact=str(tmp_path / "tables.pkl")))
+    srv = api.make_server("127.0.0.1", 0, workers=1)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def request(srv, method, path, body=None):
+    conn = http.client.HTTPConnection("127.0.0.1", srv.server_address[1], timeout=10)
+    try:
+        conn.request(method, path, body=body)
+        r = conn.getresponse()
+        return r.status, json.loads(r.read())
+    finally:
+        conn.close()
+
+
+def test_unexpected_error_in_get_is_a_500(server, monkeypatch):
+    def broken(gtin):
+        raise RuntimeError("bug")
+
+    monkeypatch.setattr(api, "reconcile", broken)
+    status, body = request(server, "GET", "/product/4006381333931")
+    assert status == 500
+    assert body == {"error": "internal server error"}
+    # the server keeps answering
+    assert request(server, "GET", "/healthz")[0] == 200
+
+
+def test_unexpected_error_in_post_is_a_500(server, monkeypatch):
+    def broken(self, image, timeout=30):
+        raise KeyError("bug")
+
+    monkeypatch.setattr(api.BiteRightAPI, "decode", broken)
+    status, body = request(server, "POST", "/scan", b"not really an image")
+    assert status == 500
+    assert body == {"error": "internal server error"}
+
+
+def test_api_errors_keep_their_status(server):
+    assert request(server, "GET", "/nope") == (404, {"error": "no route for GET /nope"})
+    assert request(server, "GET", "/product/123")[0] == 400
@@ -0,0 +1,27 @@
+import io
+import json
+import os
+
+import pytest
+
+pytest.importorskip("pyzbar.pyzbar", exc_type=ImportError)  # needs libzbar
+
+import batch  # noqa: E402
+
+
+def crash_on_poison(path):
+    if "poison" in path:
+        os._exit(1)  # a native crash takes the worker process with it
+    return batch._record(path)
+
+
+def test_a_crashing_image_does_not_abort_the_run(monkeypatch):
+    # the pool inherits the patched module through fork
+    monkeypatch.setattr(batch, "decode_file", crash_on_poison)
+    paths = [f"shelf/{i}.jpg" for i in range(6)] + ["shelf/poison.jpg"] + [f"shelf/{i}.jpg" for i in range(6, 12)]
+    out = io.StringIO()
+    stats = batch.run(paths, workers=2, out=out)
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert sorted(r["path"] for r in records) == sorted(paths)
+    assert [r["path"] for r in records if r["error"]] == ["shelf/poison.jpg"]
+    assert stats == {"images": 13, "decoded": 0, "failed": 12, "errors": 1}
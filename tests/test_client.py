@@ -0,0 +1,89 @@
+import time
+
+import pytest
+
+pytest.importorskip("pyzbar.pyzbar", exc_type=ImportError)  # needs libzbar
+
+from source import OpenFoodFactsClient, UpstreamError  # noqa: E402
+from stub_off import synthetic_product  # noqa: E402
+
+GTIN = "2000000000015"
+
+
+def found(gtin=GTIN, headers=None):
+    return (200, {"status": "success", "code": gtin, "product": synthetic_product(gtin)}, headers or {})
+
+
+def client(server, **kwargs):
+    kwargs.setdefault("backoff", 0.01)
+    return OpenFoodFactsClient(base_url=server.url, timeout=2, **kwargs)
+
+
+def test_200_returns_product(scripted_server):
+    scripted_server.script = [found()]
+    product = client(scripted_server).fetch(GTIN)
+    assert product["product_name"] == synthetic_product(GTIN)["product_name"]
+    assert scripted_server.requests[0][0].startswith(f"/api/v3/product/{GTIN}?fields=")
+
+
+def test_304_revalidates_with_etag(scripted_server):
+    scripted_server.script = [found(headers={"ETag": '"v1"'}), (304, b"", {})]
+    off = client(scripted_server)
+    first = off.fetch(GTIN)
+    assert off.fetch(GTIN) == first
+    assert scripted_server.requests[1][1].get("If-None-Match") == '"v1"'
+
+
+def test_404_is_none(scripted_server):
+    scripted_server.script = [(404, {"status": "failure", "code": GTIN}, {})]
+    assert client(scripted_server).fetch(GTIN) is None
+    assert len(scripted_server.requests) == 1
+
+
+def test_5xx_is_retried_then_succeeds(scripted_server):
+    scripted_server.script = [(503, {"status": "failure"}, {}), (502, b"", {}), found()]
+    assert client(scripted_server).fetch(GTIN) is not None
+    assert len(scripted_server.requests) == 3
+
+
+def test_other_status_raises_without_retry(scripted_server):
+    scripted_server.script = [(400, {"status": "failure"}, {})]
+    with pytest.raises(UpstreamError):
+        client(scripted_server).fetch(GTIN)
+    assert len(scripted_server.requests) == 1
+
+
+def test_retry_after_is_honoured(scripted_server):
+    scripted_server.script = [(429, {"status": "failure"}, {"Retry-After": "0.3"}), found()]
+    t0 = time.monotonic()
+    assert client(scripted_server).fetch(GTIN) is not None
+    assert time.monotonic() - t0 >= 0.3
+
+
+def test_retry_after_past_deadline_gives_up(scripted_server):
+    scripted_server.script = [(503, {"status": "failure"}, {"Retry-After": "30"}), found()]
+    t0 = time.monotonic()
+    with pytest.raises(UpstreamError):
+        client(scripted_server, deadline=1).fetch(GTIN)
+    assert time.monotonic() - t0 < 1
+    assert len(scripted_server.requests) == 1
+
+
+def test_deadline_bounds_retries(scripted_server):
+    scripted_server.script = [(503, {"status": "failure"}, {})] * 50
+    t0 = time.monotonic()
+    with pytest.raises(UpstreamError):
+        client(scripted_server, deadline=0.5, retries=50, backoff=0.1, max_backoff=0.1).fetch(GTIN)
+    assert time.monotonic() - t0 < 1.5
+
+
+def test_truncated_body_is_retried(scripted_server):
+    scripted_server.script = ["truncate", found()]
+    assert client(scripted_server).fetch(GTIN) is not None
+    assert len(scripted_server.requests) == 2
+
+
+def test_truncated_body_every_time_raises_upstream_error(scripted_server):
+    scripted_server.script = ["truncate"] * 4
+    with pytest.raises(UpstreamError):
+        client(scripted_server, retries=3).fetch(GTIN)
@@ -0,0 +1,166 @@
+import io
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+import pytest
+from PIL import Image
+
+from decode_cache import DecodeCache
+from gtin import check_digit
+
+# EAN-13 symbol tables: L/G/R patterns per digit, and the L/G parity that encodes the first digit
+L_CODES = ["0001101", "0011001", "0010011", "0111101", "0100011",
+           "0110001", "0101111", "0111011", "0110111", "0001011"]
+R_CODES = ["".join("1" if b == "0" else "0" for b in code) for code in L_CODES]
+G_CODES = [code[::-1] for code in R_CODES]
+PARITY = ["LLLLLL", "LLGLGG", "LLGGLG", "LLGGGL", "LGLLGG", "LGGLLG", "LGGGLL", "LGLGLG", "LGLGGL", "LGGLGL"]
+QUIET = 11
+
+
+class Read(NamedTuple):
+    data: str
+    symbology: str
+
+
+def ean13(body: str) -> str:
+    return body + str(check_digit(body))
+
+
+def modules(code: str) -> str:
+    left = "".join((L_CODES if p == "L" else G_CODES)[int(d)] for p, d in zip(PARITY[int(code[0])], code[1:7]))
+    right = "".join(R_CODES[int(d)] for d in code[7:])
+    return "101" + left + "01010" + right + "101"
+
+
+def render(code: str, module: int = 3, fmt: str = "PNG") -> bytes:
+    bits = modules(code)
+    width = (len(bits) + 2 * QUIET) * module
+    img = Image.new("L", (width, 40 * module), 255)
+    for i, bit in enumerate(bits):
+        if bit == "1":
+            x = (QUIET + i) * module
+            img.paste(0, (x, 0, x + module, img.height))
+    buf = io.BytesIO()
+    img.save(buf, fmt, **({"quality": 90} if fmt == "JPEG" else {}))
+    return buf.getvalue()
+
+
+def read(data: bytes):
+    """Reference decoder for the clean synthetic symbols above (ground truth, no zbar)."""
+    img = Image.open(io.BytesIO(data)).convert("L")
+    row = [img.getpixel((x, img.height // 2)) < 128 for x in range(img.width)]
+    if True not in row:
+        return None
+    start = row.index(True)
+    module = row.index(False, start) - start
+    bits = "".join("1" if row[int(start + (i + 0.5) * module)] else "0" for i in range(95))
+    digits, parity = [], ""
+    for i in range(6):
+        chunk = bits[3 + 7 * i:10 + 7 * i]
+        if chunk in L_CODES:
+            digits.append(L_CODES.index(chunk))
+            parity += "L"
+        elif chunk in G_CODES:
+            digits.append(G_CODES.index(chunk))
+            parity += "G"
+        else:
+            return None
+    for i in range(6):
+        chunk = bits[50 + 7 * i:57 + 7 * i]
+        if chunk not in R_CODES:
+            return None
+        digits.append(R_CODES.index(chunk))
+    if parity not in PARITY:
+        return None
+    code = str(PARITY.index(parity)) + "".join(map(str, digits))
+    return Read(code, "EAN13") if check_digit(code[:-1]) == int(code[-1]) else None
+
+
+# neighbours differing in one digit look the same at thumbnail scale
+CODES = [ean13("400638133393"), ean13("400638133394"), ean13("500638133393"),
+         ean13("012345678905"), ean13("871234567890"), ean13("200000000001")]
+
+
+def uploads():
+    out = []
+    for code in CODES:
+        out += [(code, render(code)), (code, render(code, fmt="JPEG")), (code, render(code, module=2))]
+    blank = io.BytesIO()
+    Image.new("L", (300, 120), 255).save(blank, "PNG")
+    out.append((None, blank.getvalue()))
+    return out
+
+
+def test_reference_decoder_reads_every_symbol():
+    for code, data in uploads():
+        found = read(data)
+        assert (found.data if found else None) == code
+
+
+def test_results_identical_with_cache_on_and_off():
+    cases = uploads() * 3
+    random.Random(0).shuffle(cases)
+    cache = DecodeCache()
+    for code, data in cases:
+        cached = cache.get_or_decode(data, read)
+        assert cached == read(data)
+        assert (cached.data if cached else None) == code
+    stats = cache.stats()
+    assert stats["misses"] == len(uploads())
+    assert stats["hits"] == len(cases) - len(uploads())
+
+
+def test_lru_bound_and_failed_decodes_are_cached():
+    cache = DecodeCache(max_entries=2)
+    calls = []
+
+    def decode(data):
+        calls.append(data)
+        return read(data)
+
+    a, b, c = (render(code) for code in CODES[:3])
+    for data in (a, b, a, c, a):
+        cache.get_or_decode(data, decode)
+    assert calls == [a, b, c]
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["size"] == 2
+
+    blank = uploads()[-1][1]
+    assert cache.get_or_decode(blank, decode) is None
+    assert cache.get_or_decode(blank, decode) is None
+    assert calls.count(blank) == 1
+
+
+def test_concurrent_uploads_of_the_same_bytes_decode_once():
+    cache = DecodeCache()
+    data = render(CODES[0])
+    release, calls = threading.Event(), []
+
+    def slow_read(data):
+        calls.append(1)
+        release.wait(5)
+        return read(data)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(cache.get_or_decode, data, slow_read) for _ in range(8)]
+        release.set()
+    assert {f.result().data for f in futures} == {CODES[0]}
+    assert len(calls) == 1
+
+
+def test_zbar_results_identical_with_cache_on_and_off():
+    pytest.importorskip("pyzbar.pyzbar", exc_type=ImportError)  # needs libzbar
+    import source
+
+    cases = uploads() * 2
+    source.set_decode_cache(None)
+    try:
+        expected = [source.decode_barcode_from_image(data) for _, data in cases]
+        source.set_decode_cache(DecodeCache())
+        assert [source.decode_barcode_from_image(data) for _, data in cases] == expected
+    finally:
+        source.set_decode_cache(None)
+    # never another product's GTIN
+    assert all(found in (None, code) for found, (code, _) in zip(expected, cases))
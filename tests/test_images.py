@@ -0,0 +1,41 @@
+import io
+import threading
+import time
+
+from PIL import Image
+
+from images import ImageProxy
+
+
+def jpeg(width, height):
+    buf = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+def test_thumbnails_are_fetched_concurrently(tmp_path, monkeypatch):
+    proxy = ImageProxy(cache_dir=str(tmp_path), height=100, allowed_hosts=None)
+    in_flight, peak, lock = [0], [0], threading.Lock()
+
+    def slow_download(url):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.3)
+        with lock:
+            in_flight[0] -= 1
+        return jpeg(400, 800)
+
+    monkeypatch.setattr(proxy, "_download", slow_download)
+    t0 = time.perf_counter()
+    front, missing, nutri = proxy.thumbnails(["https://images.example/front.jpg", None,
+                                              "https://images.example/nutrition.jpg"])
+    assert time.perf_counter() - t0 < 0.55
+    assert peak[0] == 2
+    assert missing is None
+    assert Image.open(io.BytesIO(front)).size == (50, 100)
+    assert nutri is not None
+
+    # served from disk the second time
+    assert proxy.thumbnails(["https://images.example/front.jpg"]) == [front]
+    assert proxy.stats()["hits"] == 1
@@ -0,0 +1,69 @@
+import pytest
+
+from engine import CSV
+from matcher import UNKNOWN, FuzzyMatcher, RiskMatcher, bounded_levenshtein
+from tables import parse_risk_csv
+
+ALIASES = {
+    "sodium nitrate": ("Preservative", "High", "Nitrosamines"),
+    "sodium nitrite": ("Preservative", "High", "Nitrosamines"),
+    "potassium nitrate": ("Preservative", "High", "Nitrosamines"),
+    "potassium bromate": ("Flour treatment", "High", "Possible carcinogen"),
+    "calcium caseinate": ("Milk protein", "Low", "Allergen"),
+    "monosodium glutamate": ("Flavour enhancer", "Moderate", "Sensitivity"),
+    "aspartame": ("Sweetener", "Moderate", "Phenylketonuria"),
+    "titanium dioxide (e171)": ("Colour", "High", "Genotoxicity"),
+    "red 40": ("Colour", "Moderate", "Hyperactivity"),
+}
+
+
+@pytest.fixture(scope="module")
+def fuzzy():
+    return FuzzyMatcher(ALIASES)
+
+
+@pytest.mark.parametrize("token", [
+    "sodium citrate",
+    "potassium citrate",
+    "potassium iodate",
+    "calcium carbonate",
+    "red 41",
+])
+def test_one_substituted_word_is_not_a_typo(fuzzy, token):
+    assert fuzzy.match(token) == (UNKNOWN, 0.0)
+
+
+@pytest.mark.parametrize("token, alias", [
+    ("sodium nitrte", "sodium nitrite"),
+    ("potasium nitrate", "potassium nitrate"),
+    ("monosodium glutamte", "monosodium glutamate"),
+    ("aspartme", "aspartame"),
+    ("titanium dioxid", "titanium dioxide (e171)"),
+    ("e 171", "titanium dioxide (e171)"),
+    ("sodiumnitrite", "sodium nitrite"),
+    ("contains potassium bromat", "potassium bromate"),
+])
+def test_typos_still_match(fuzzy, token, alias):
+    hit, similarity = fuzzy.match(token)
+    assert hit == ALIASES[alias]
+    assert similarity >= fuzzy.threshold
+
+
+def test_real_risk_list_rejects_substituted_words():
+    fuzzy = FuzzyMatcher(parse_risk_csv(CSV))
+    for token in ("sodium citrate", "potassium citrate", "potassium iodate", "calcium carbonate"):
+        alias = fuzzy.best(token)
+        assert alias is None or alias[1] == 1.0, (token, alias)
+
+
+def test_exact_matcher_prefers_longest_alias():
+    matcher = RiskMatcher(ALIASES)
+    assert matcher.match("sodium nitrite") == ALIASES["sodium nitrite"]
+    assert matcher.match("cured with sodium nitrite and salt") == ALIASES["sodium nitrite"]
+    assert matcher.match("salt") is UNKNOWN
+
+
+def test_bounded_levenshtein():
+    assert bounded_levenshtein("nitrate", "citrate", 2) == 1
+    assert bounded_levenshtein("kitten", "sitting", 3) == 3
+    assert bounded_levenshtein("kitten", "sitting", 1) == 2
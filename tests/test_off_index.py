@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+pytest.importorskip("pyzbar.pyzbar", exc_type=ImportError)  # needs libzbar
+
+from engine import MACRO_KEYS, get_serving  # noqa: E402
+from off_index import LocalIndex, add_serving_values, build_index, iter_csv  # noqa: E402
+
+DUMP = os.path.join(os.path.dirname(__file__), "fixtures", "off_dump.tsv")
+
+
+def test_csv_rows_get_per_serving_values():
+    rows = dict(iter_csv(DUMP))
+    assert set(rows) == {"0012345678905", "4006381333931"}
+    nut = rows["0012345678905"]["nutriments"]
+    assert nut["energy-kcal_serving"] == pytest.approx(160)
+    assert nut["energy-kcal_unit"] == "kcal"
+    assert nut["fat_serving"] == pytest.approx(5)
+    assert nut["sodium_serving"] == pytest.approx(0.2)
+    assert nut["calcium_unit"] == "g"
+
+
+def test_no_serving_quantity_leaves_100g_only():
+    nut = dict(iter_csv(DUMP))["4006381333931"]["nutriments"]
+    assert nut["sodium_100g"] == pytest.approx(0.01)
+    assert not any(name.endswith("_serving") for name in nut)
+
+
+def test_existing_serving_values_win():
+    prod = {"serving_quantity": "30", "nutriments": {"fat_100g": 10, "fat_serving": 2.5, "fat_unit": "g"}}
+    assert add_serving_values(prod)["nutriments"]["fat_serving"] == 2.5
+
+
+def test_index_serves_macros(tmp_path):
+    db = str(tmp_path / "index.sqlite3")
+    assert build_index(DUMP, db) == 2
+    index = LocalIndex(db)
+    try:
+        product = index.get("0012345678905")
+        assert product["brand"] == "Acme"
+        assert product["image_front_url"] == "https://images.example/1/front.jpg"
+        macros = {key: get_serving(product["nutriments"], key, unit) for key, (_, unit) in MACRO_KEYS.items()}
+        assert macros["energy-kcal"] == (160, "kcal")
+        assert macros["sugars"] == (10, "g")
+        assert index.get("0000000000000") is None
+    finally:
+        index.close()
@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("pyzbar.pyzbar", exc_type=ImportError)  # needs libzbar
+
+import gtin as gtins  # noqa: E402
+import source  # noqa: E402
+from stub_off import StubOFF, make_gtin, synthetic_product  # noqa: E402
+
+
+@pytest.fixture
+def use_server(monkeypatch):
+    """Point reconcile() at a test server, with no offline index or product cache in the way."""
+    previous = source.get_client()
+    monkeypatch.setattr(source, "get_local_index", lambda: None)
+    monkeypatch.setattr(source, "_product_cache", False)
+
+    def use(url):
+        source.set_client(source.OpenFoodFactsClient(base_url=url, timeout=2, backoff=0.01, pool_size=16))
+
+    yield use
+    source.set_client(previous)
+
+
+def ambiguous_8_digit():
+    """An 8-digit code that is a valid EAN-8 and a valid UPC-E at once."""
+    for i in range(10 ** 7):
+        code = f"0{i:06d}"
+        code += str(gtins.check_digit(code))
+        if gtins.is_valid_upce(code):
+            return code
+
+
+def test_candidates_only_fan_out_for_ambiguous_input():
+    assert gtins.candidates("012345678905") == ["0012345678905"]
+    assert gtins.candidates("0012345678905") == ["0012345678905"]
+    assert gtins.fallbacks("0012345678905") == ["012345678905"]
+    assert gtins.fallbacks("4006381333931") == []
+    assert len(gtins.candidates(ambiguous_8_digit())) == 2
+
+
+def test_leading_zero_gtins_cost_one_request(use_server):
+    catalog = [make_gtin(i) for i in range(1, 80, 2)]
+    assert all(g.startswith("0") for g in catalog)
+    with StubOFF() as stub:
+        use_server(stub.url)
+        assert all(source.reconcile(g) is not None for g in catalog)
+    assert stub.requests == len(catalog)
+
+
+def test_12_digit_form_is_tried_only_on_a_miss(use_server, scripted_server):
+    key = "0012345678905"
+    scripted_server.script = [
+        (404, {"status": "failure"}, {}),
+        (200, {"status": "success", "product": synthetic_product(key)}, {}),
+    ]
+    use_server(scripted_server.url)
+    assert source.reconcile("012345678905")["product_name"] == synthetic_product(key)["product_name"]
+    paths = [path.split("?")[0] for path, _ in scripted_server.requests]
+    assert paths == [f"/api/v3/product/{key}", f"/api/v3/product/{key[1:]}"]
+
+
+def test_unknown_leading_zero_gtin_is_none(use_server, scripted_server):
+    use_server(scripted_server.url)
+    assert source.reconcile("0012345678905") is None
+    assert len(scripted_server.requests) == 2
+
+
+def test_upstream_error_is_not_reported_as_not_found(use_server, scripted_server):
+    scripted_server.script = [(400, {"status": "failure"}, {}), (404, {"status": "failure"}, {})]
+    use_server(scripted_server.url)
+    with pytest.raises(source.UpstreamError):
+        source.reconcile("0012345678905")
+
+
+def test_ambiguous_input_queries_every_reading(use_server, scripted_server):
+    code = ambiguous_8_digit()
+    upca = gtins.canonical(gtins.expand_upce(code))
+    use_server(scripted_server.url)
+    assert source.reconcile(code) is None
+    paths = {path.split("?")[0].rsplit("/", 1)[-1] for path, _ in scripted_server.requests}
+    assert paths == {code, upca, upca[1:]}
+
+
+def test_slow_first_reading_does_not_hold_up_a_hit(monkeypatch):
+    code = ambiguous_8_digit()
+    first, second = gtins.candidates(code)
+    release = threading.Event()
+
+    def lookup_key(key):
+        if key == first:
+            release.wait(5)
+            return None
+        return {"code": key}
+
+    monkeypatch.setattr(source, "lookup_key", lookup_key)
+    t0 = time.perf_counter()
+    try:
+        assert source.reconcile(code) == {"code": second}
+        assert time.perf_counter() - t0 < 1
+    finally:
+        release.set()
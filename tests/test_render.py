@@ -0,0 +1,37 @@
+import pandas as pd
+import requests
+
+from engine import Tables, analyze_product
+from render import build_dashboard, style_summary
+
+TABLES = Tables.build({"sodium nitrite": ("Preservative", "High", "Nitrosamines")}, {})
+PRODUCT = {
+    "product_name": "Hot Dogs",
+    "brand": "Acme",
+    "ingredients_text": "pork, water, salt, sodium nitrite",
+    "nutriments": {"fat_serving": 12.0, "fat_unit": "g"},
+    "image_front_url": "https://images.example/front.jpg",
+    "image_nutri_url": "https://images.example/nutrition.jpg",
+    "serving_size": "50 g",
+}
+
+
+def test_dashboard_carries_image_urls_without_fetching(monkeypatch):
+    def no_fetch(*args, **kwargs):
+        raise AssertionError("build_dashboard fetched an image")
+
+    monkeypatch.setattr(requests.Session, "get", no_fetch)
+    dashboard = build_dashboard(analyze_product(dict(PRODUCT, image_nutri_url=None), TABLES))
+    assert dashboard.front_image_url == "https://images.example/front.jpg"
+    assert dashboard.nutri_image_url is None
+    assert "sodium nitrite" in dashboard.pills
+
+
+def test_cached_summary_is_plain_data_styled_per_render():
+    dashboard = build_dashboard(analyze_product(PRODUCT, TABLES))
+    assert isinstance(dashboard.summary, pd.DataFrame)
+    first, second = style_summary(dashboard.summary), style_summary(dashboard.summary)
+    assert first is not second
+    html = first.to_html()
+    assert "#FEE2E2" in html and "sodium nitrite" in html
+    assert list(dashboard.summary.columns) == ["Ingredient", "Category", "Concern", "Risk"]
@@ -0,0 +1,107 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from singleflight import SingleFlight
+
+N = 16
+
+
+def wait_until(predicate, timeout=5):
+    stop = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < stop, "timed out"
+        time.sleep(0.001)
+
+
+def run_together(flights, key, fn, n=N):
+    """n threads call flights.do(key, fn) at once; fn is held until every one of them has called in."""
+    release = threading.Event()
+
+    def gated():
+        release.wait(5)
+        return fn()
+
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        futures = [pool.submit(flights.do, key, gated) for _ in range(n)]
+        wait_until(lambda: flights.stats()["calls"] == n)
+        release.set()
+    return futures
+
+
+def test_one_execution_per_key():
+    flights = SingleFlight()
+    runs = []
+    futures = run_together(flights, "k", lambda: runs.append(1) or len(runs))
+    assert runs == [1]
+    assert flights.stats() == {"calls": N, "executions": 1, "shared": N - 1}
+    assert flights.in_flight() == 0
+    assert [f.result() for f in futures] == [1] * N
+
+
+def test_waiters_get_the_same_object():
+    flights = SingleFlight()
+    futures = run_together(flights, "k", lambda: {"product": "x"})
+    results = [f.result() for f in futures]
+    assert all(r is results[0] for r in results)
+
+
+def test_waiters_get_the_same_exception():
+    flights = SingleFlight()
+
+    def boom():
+        raise ValueError("upstream down")
+
+    futures = run_together(flights, "k", boom)
+    errors = [f.exception() for f in futures]
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert all(e is errors[0] for e in errors)
+    assert flights.stats()["executions"] == 1
+
+
+def test_key_is_free_again_after_completion():
+    flights = SingleFlight()
+    assert flights.do("k", lambda: 1) == 1
+    with pytest.raises(KeyError):
+        flights.do("k", lambda: {}["missing"])
+    assert flights.do("k", lambda: 3) == 3
+    assert flights.stats() == {"calls": 3, "executions": 3, "shared": 0}
+
+
+def test_different_keys_do_not_serialize():
+    flights = SingleFlight()
+    barrier = threading.Barrier(N, timeout=5)
+
+    def fn(i):
+        # only passes if all N keys are running at the same time
+        barrier.wait()
+        return i
+
+    with ThreadPoolExecutor(max_workers=N) as pool:
+        futures = [pool.submit(flights.do, i, fn, i) for i in range(N)]
+        assert [f.result() for f in futures] == list(range(N))
+    assert flights.stats() == {"calls": N, "executions": N, "shared": 0}
+
+
+def test_fetch_coalesced_makes_one_upstream_request():
+    pytest.importorskip("pyzbar.pyzbar", exc_type=ImportError)  # needs libzbar
+    import source
+    from stub_off import StubOFF, make_gtin
+
+    gtin = make_gtin(7)
+    with StubOFF(latency=0.3) as stub:
+        previous = source.get_client()
+        source.set_client(source.OpenFoodFactsClient(base_url=stub.url, pool_size=N))
+        try:
+            before = source.upstream_flights.stats()
+            with ThreadPoolExecutor(max_workers=N) as pool:
+                results = list(pool.map(source.fetch_coalesced, [gtin] * N))
+            after = source.upstream_flights.stats()
+        finally:
+            source.set_client(previous)
+    assert stub.requests == 1
+    assert all(r == results[0] and r["product_name"] for r in results)
+    assert after["calls"] - before["calls"] == N
+    assert after["executions"] - before["executions"] == 1
@@ -0,0 +1,76 @@
+import io
+
+import pytest
+from PIL import Image
+
+pytest.importorskip("pyzbar.pyzbar", exc_type=ImportError)  # needs libzbar
+
+import stream_scan  # noqa: E402
+from source import Barcode  # noqa: E402
+from stream_scan import StreamScanner, scan, scan_upload  # noqa: E402
+
+CODE = Barcode("4006381333931", "EAN13")
+OTHER = Barcode("0012345678905", "EAN13")
+BLANK, MARKED, MISREAD = 255, 0, 100
+
+
+@pytest.fixture(autouse=True)
+def detector(monkeypatch):
+    """A frame 'contains' CODE when its top-left pixel is black, OTHER when it is gray."""
+    def locate(gray):
+        found = {MARKED: CODE, MISREAD: OTHER}.get(gray.getpixel((0, 0)))
+        if found is not None:
+            return found, (0, 0, gray.width, gray.height)
+        return None, None
+
+    monkeypatch.setattr(stream_scan, "locate_barcode", locate)
+
+
+def frame(value):
+    return Image.new("L", (40, 20), value)
+
+
+def gif(*values):
+    frames = [frame(v).convert("P") for v in values]
+    buf = io.BytesIO()
+    frames[0].save(buf, "GIF", save_all=True, append_images=frames[1:], duration=40)
+    return buf.getvalue()
+
+
+def test_confirms_after_k_reads():
+    result = scan([frame(BLANK), frame(MARKED), frame(MARKED), frame(MARKED)], StreamScanner(k=2, stride=1))
+    assert result.barcode == CODE
+    assert result.frames == 3
+
+
+def test_single_read_is_returned_when_frames_run_out():
+    result = scan([frame(BLANK), frame(MARKED), frame(BLANK)], StreamScanner(k=2, stride=1))
+    assert result.barcode == CODE
+    assert result.frames == 3
+
+
+def test_end_of_stream_prefers_the_most_read_code():
+    result = scan([frame(MARKED), frame(MARKED), frame(MISREAD)], StreamScanner(k=3, stride=1))
+    assert result.barcode == CODE
+
+
+def test_end_of_stream_with_disagreeing_reads_is_none():
+    assert scan([frame(MARKED), frame(MISREAD)], StreamScanner(k=3, stride=1)).barcode is None
+    frames = [frame(MISREAD), frame(MARKED), frame(MARKED), frame(MISREAD)]
+    assert scan(frames, StreamScanner(k=3, stride=1)).barcode is None
+
+
+def test_nothing_read_is_none():
+    assert scan([frame(BLANK)] * 4, StreamScanner(k=2, stride=1)).barcode is None
+
+
+def test_single_frame_gif_upload():
+    result = scan_upload(gif(MARKED), "one.gif", StreamScanner(k=2, stride=1))
+    assert result.barcode == CODE
+    assert result.frames == 1
+
+
+def test_multi_frame_gif_upload():
+    result = scan_upload(gif(BLANK, MARKED, MARKED, BLANK), "clip.gif", StreamScanner(k=2, stride=1))
+    assert result.barcode == CODE
+    assert result.frames == 3
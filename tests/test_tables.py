@@ -0,0 +1,94 @@
+import shutil
+import time
+
+import pytest
+
+import tables
+from engine import CSV, DV_CSV, match_ingredients
+from matcher import RiskMatcher
+from tables import TableError, TableStore, compile_tables, load_artifact, tables_from
+
+TEXT = "water, sugar, sodium nitrite, red 40, titanium dioxide (e171), natural flavour"
+
+
+@pytest.fixture
+def sources(tmp_path):
+    risk, dv = tmp_path / "risk.csv", tmp_path / "dv.csv"
+    shutil.copy(CSV, risk)
+    shutil.copy(DV_CSV, dv)
+    return str(risk), str(dv), str(tmp_path / "tables.pkl")
+
+
+def wait_until(predicate, timeout=5):
+    stop = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < stop, "timed out"
+        time.sleep(0.01)
+
+
+def test_artifact_loads_without_rebuilding_the_automaton(sources, monkeypatch):
+    risk, dv, artifact = sources
+    compile_tables(risk, dv, artifact)
+    fresh = tables_from(compile_tables(risk, dv, None))
+
+    def no_rebuild(*args):
+        raise AssertionError("automaton rebuilt on load")
+
+    monkeypatch.setattr(RiskMatcher, "_build_links", no_rebuild)
+    loaded = tables_from(load_artifact(artifact))
+    assert match_ingredients(TEXT, loaded) == match_ingredients(TEXT, fresh)
+    assert loaded.version == fresh.version
+
+
+def test_old_format_is_recompiled(sources):
+    risk, dv, artifact = sources
+    compile_tables(risk, dv, artifact)
+    with open(artifact, "r+b") as f:
+        header = f.readline()
+        f.seek(0)
+        f.write(header.replace(b" %d " % tables.FORMAT, b" %d " % (tables.FORMAT - 1)))
+    with pytest.raises(TableError):
+        load_artifact(artifact)
+    store = TableStore(risk, dv, artifact)
+    assert store.current().matcher.match("sodium nitrite") != ("—", "Unknown", "Not in risk list")
+    load_artifact(artifact)
+
+
+def test_undecodable_csv_keeps_previous_tables(sources):
+    risk, dv, artifact = sources
+    store = TableStore(risk, dv, artifact)
+    before = store.version
+    with open(risk, "ab") as f:
+        f.write(b'"Colour","[\'bad \xff\xfe\']","High","x"\n')
+    assert store.reload() is False
+    assert "risk.csv" in store.last_error
+    assert store.version == before
+    # the same broken file is not retried on every poll
+    assert store.reload() is False
+
+
+def test_watcher_survives_unexpected_errors(sources, monkeypatch):
+    risk, dv, artifact = sources
+    store = TableStore(risk, dv, artifact, poll_interval=0.01)
+    real_reload = store.reload
+    calls = []
+
+    def flaky_reload(force=False):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("disk on fire")
+        return real_reload(force)
+
+    monkeypatch.setattr(store, "reload", flaky_reload)
+    store.start()
+    try:
+        wait_until(lambda: len(calls) >= 3)
+        assert store.stats()["watching"] is True
+        with open(risk, "a", encoding="utf-8") as f:
+            f.write('"Colour","[\'test dye 1\']","High","Test"\n')
+        wait_until(lambda: store.reloads == 1)
+        assert store.last_error is None
+        assert store.current().matcher.match("test dye 1")[1] == "High"
+    finally:
+        store.stop()
+    wait_until(lambda: not store.stats()["watching"])